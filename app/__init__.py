@@ -7,7 +7,7 @@ import google.generativeai as genai
 # Load environment variables from .env file
 load_dotenv()
 
-def create_app():
+def create_app(start_services=True):
     app = Flask(__name__)
     
     # Configure Flask app
@@ -31,9 +31,14 @@ def create_app():
     Session(app)
     
     # Register blueprints
-    from .routes import main
+    from .routes import main, init_services
     app.register_blueprint(main)
     
+    # Start the services with the worker, so upload jobs interrupted by a restart are
+    # recovered right away instead of on the first request
+    if start_services:
+        init_services()
+    
     # Add error handlers
     @app.errorhandler(403)
     def handle_403(e):
@@ -0,0 +1,34 @@
+from quart import Quart
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from app import create_app
+from config import Config
+
+# Routes served by the async app; every other path is handled by the Flask app
+ASYNC_PATHS = ('/emails', '/emails/stream', '/suggest-reply')
+
+
+def create_asgi_app():
+    """Build the ASGI application.
+
+    The Gmail- and LLM-bound routes in ASYNC_PATHS run as coroutines on the
+    event loop, so one process can keep hundreds of their calls in flight.
+    All other routes are the unchanged Flask views, run on the loop's thread
+    pool through a WSGI adapter. Both halves share the same services.
+    """
+    flask_app = create_app()
+    async_app = Quart(__name__)
+
+    from .async_routes import main, init_async_services, close_async_services
+    async_app.register_blueprint(main)
+    async_app.before_serving(init_async_services)
+    async_app.after_serving(close_async_services)
+
+    wsgi_app = AsyncioWSGIMiddleware(flask_app, max_body_size=Config.MAX_CONTENT_LENGTH)
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'lifespan' or scope.get('path') in ASYNC_PATHS:
+            await async_app(scope, receive, send)
+        else:
+            await wsgi_app(scope, receive, send)
+
+    return application
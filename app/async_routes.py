@@ -0,0 +1,213 @@
+from quart import Blueprint, jsonify, request, Response, stream_with_context, g
+from app import routes
+from app.services.async_gmail import AsyncGmailClient
+from app.services.async_llm import AsyncLLMResponder
+from app.services.pipeline import AsyncEmailAnalysisPipeline
+from app.services.ratelimit import RateLimiter
+from config import Config
+import asyncio
+import json
+import time
+
+main = Blueprint('async_main', __name__)
+
+# Async services, built on top of the sync ones in app.routes
+async_gmail = None
+async_llm = None
+async_pipeline = None
+
+def init_async_services():
+    """Create the async services, sharing stores, caches, credentials and metrics with the sync services"""
+    global async_gmail, async_llm, async_pipeline
+    routes.init_services()
+
+    if not async_llm:
+        # Its own concurrency limit, but the same request/token buckets as the sync responder
+        rate_limiter = RateLimiter(
+            requests_per_minute=Config.GEMINI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=Config.GEMINI_TOKENS_PER_MINUTE,
+            state_path=Config.GEMINI_RATE_LIMIT_STATE_PATH or None,
+            max_concurrency=Config.ASYNC_LLM_MAX_CONCURRENCY
+        )
+        async_llm = AsyncLLMResponder(routes.llm_responder, rate_limiter=rate_limiter)
+        routes.metrics.add_collector(lambda: routes._rate_limiter_metrics('async', rate_limiter.stats()))
+
+    if not async_pipeline:
+        async_pipeline = AsyncEmailAnalysisPipeline(routes.analysis_pipeline, async_llm)
+
+    if not async_gmail:
+        async_gmail = AsyncGmailClient(
+            routes.gmail_client,
+            max_connections=Config.ASYNC_GMAIL_MAX_CONNECTIONS,
+            max_concurrency=Config.ASYNC_GMAIL_MAX_CONCURRENCY
+        )
+
+async def close_async_services():
+    global async_gmail
+    if async_gmail:
+        await async_gmail.aclose()
+        async_gmail = None
+
+async def _download_attachments(messages):
+    """Download attachments for each parsed message concurrently, skipping messages whose download fails"""
+    async def download(message):
+        try:
+            return await async_gmail.get_attachments(message)
+        except Exception as e:
+            print(f"Error downloading attachments for email {message.id}: {str(e)}")
+            return []
+
+    # Only messages that have attachments need a Gmail round trip
+    with_attachments = [message for message in messages if message.attachments]
+    attachments = {message.id: [] for message in messages}
+    results = await asyncio.gather(*(download(message) for message in with_attachments))
+    for message, result in zip(with_attachments, results):
+        attachments[message.id] = result
+    return attachments
+
+async def _list_inbox_page(page_size, page_token=None):
+    """Return (ids of one page of unread inbox messages, messages already fetched by id, next page token)"""
+    if routes.inbox_sync and not page_token:
+        # The history check is one cheap call; run the sync client off the event loop
+        messages, next_page_token = await asyncio.to_thread(routes.inbox_sync.refresh, page_size)
+        return [message.id for message in messages], {message.id: message for message in messages}, next_page_token
+    msg_ids, next_page_token = await async_gmail.list_unread_page(page_size, page_token)
+    return msg_ids, {}, next_page_token
+
+async def _iter_inbox_analyses(msg_ids, messages, refresh=False):
+    """Yield (page position, analysis) pairs as they become ready, like routes._iter_inbox_analyses"""
+    # The analysis store is SQLite; keep its queries off the event loop
+    analyses = await asyncio.to_thread(routes._stored_analyses, msg_ids, messages, refresh)
+    to_fetch = [msg_id for msg_id in msg_ids if msg_id not in analyses and msg_id not in messages]
+    if to_fetch:
+        messages = dict(messages)
+        messages.update((message.id, message) for message in await async_gmail.get_messages(to_fetch))
+
+    pending = []
+    for position, msg_id in enumerate(msg_ids):
+        if msg_id in analyses:
+            yield position, analyses[msg_id]
+        elif msg_id in messages:
+            pending.append((position, messages[msg_id]))
+
+    attachments = await _download_attachments([message for _, message in pending])
+
+    emails = [message.to_dict() for _, message in pending]
+    async for index, analysis in async_pipeline.iter_analyze(emails, attachments):
+        if 'analysis_error' not in analysis:
+            await asyncio.to_thread(routes.analysis_store.save, [analysis])
+        yield pending[index][0], analysis
+
+async def _rank_emails(summaries):
+    """Rank analyzed emails by importance, locally unless the LLM ranker is configured"""
+    if Config.RANKING_MODE == 'llm':
+        ranked_indices = await async_llm.rank_emails_by_importance(summaries)
+    else:
+        ranked_indices = routes.ranking_engine.rank(summaries)
+    return [summaries[i] for i in ranked_indices]
+
+async def _reply_options(email_body, sender_name, num_options):
+    """Reply options for an email, prefetched when possible and otherwise generated now"""
+    options = None
+    if routes.reply_prefetcher:
+        # May wait for a prefetch that is already running
+        options = await asyncio.to_thread(routes.reply_prefetcher.get, email_body, sender_name, num_options)
+    if options is None:
+        options = await async_llm.generate_reply_options(
+            email_body,
+            sender_name=sender_name,
+            num_options=num_options
+        )
+        if routes.reply_prefetcher:
+            routes.reply_prefetcher.put(email_body, sender_name, num_options, options)
+    return options
+
+@main.before_request
+async def _start_request_metrics():
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    routes.metrics.inc('http_requests_in_flight', route=g.metrics_route)
+
+@main.after_request
+async def _record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@main.teardown_request
+async def _finish_request_metrics(exception):
+    """Record route latency; streamed responses are timed until the stream ends"""
+    if 'metrics_start' not in g:
+        return
+    routes.metrics.dec('http_requests_in_flight', route=g.metrics_route)
+    routes.metrics.observe(
+        'http_request_duration_seconds',
+        time.perf_counter() - g.metrics_start,
+        route=g.metrics_route,
+        method=request.method,
+        status=g.get('metrics_status', 500)
+    )
+
+@main.route('/emails')
+async def get_emails():
+    """Get one page of unread emails with enhanced analysis"""
+    try:
+        page_size, page_token = routes._page_args(request.args)
+        msg_ids, messages, next_page_token = await _list_inbox_page(page_size, page_token)
+        analyses = {
+            position: summary
+            async for position, summary in _iter_inbox_analyses(msg_ids, messages, routes._refresh_arg(request.args))
+        }
+        ranked_emails = await _rank_emails([analyses[position] for position in sorted(analyses)])
+        routes._prefetch_replies(ranked_emails, first_page=not page_token)
+
+        return jsonify({
+            'status': 'success',
+            'emails': ranked_emails,
+            'analysis_summary': routes._analysis_summary(ranked_emails),
+            'next_page_token': next_page_token
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@main.route('/emails/stream')
+async def stream_emails():
+    """Stream one page of analyzed emails as NDJSON events, followed by the page's ranking"""
+    page_size, page_token = routes._page_args(request.args)
+    refresh = routes._refresh_arg(request.args)
+
+    @stream_with_context
+    async def generate():
+        try:
+            msg_ids, messages, next_page_token = await _list_inbox_page(page_size, page_token)
+            analyses = {}
+            async for position, summary in _iter_inbox_analyses(msg_ids, messages, refresh):
+                analyses[position] = summary
+                yield json.dumps({'type': 'email', 'email': summary}) + '\n'
+
+            ranked_emails = await _rank_emails([analyses[position] for position in sorted(analyses)])
+            routes._prefetch_replies(ranked_emails, first_page=not page_token)
+            yield json.dumps({
+                'type': 'ranking',
+                'ranked_ids': [e['id'] for e in ranked_emails],
+                'analysis_summary': routes._analysis_summary(ranked_emails),
+                'next_page_token': next_page_token
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'message': str(e)}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@main.route('/suggest-reply', methods=['POST'])
+async def suggest_reply():
+    """Generate personalized reply suggestions with placeholders, served from the prefetch cache when ready"""
+    try:
+        data = await request.get_json()
+        options = await _reply_options(data.get('body', ''), data.get('sender_name'), data.get('num_options', 3))
+
+        return jsonify({
+            'status': 'success',
+            'options': options,
+            'placeholders': routes.REPLY_PLACEHOLDERS
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1,40 +1,374 @@
-from flask import Blueprint, render_template, jsonify, request, session, redirect, url_for, current_app
+from flask import Blueprint, render_template, jsonify, request, session, redirect, url_for, current_app, Response, stream_with_context, g
 from app.services.gmail import GmailClient
 from app.services.llm import LLMResponder
 from app.services.file_processor import FileProcessor
+from app.services.profiler import TabularProfiler
+from app.services.pipeline import EmailAnalysisPipeline
+from app.services.cache import LLMCache
+from app.services.store import MessageStore
+from app.services.analysis_store import AnalysisStore
+from app.services.sync import InboxSync
+from app.services.attachment_store import AttachmentStore
+from app.services.ratelimit import RateLimiter
+from app.services.prescorer import HeuristicScorer
+from app.services.ranking import RankingEngine
+from app.services.jobs import JobQueue
+from app.services.prefetch import ReplyPrefetcher
+from app.services.metrics import Metrics
 from config import Config
 import google.generativeai as genai
-import pickle
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 import base64
+import json
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
-import os
 
 main = Blueprint('main', __name__)
 
+# Placeholder legend returned with reply suggestions
+REPLY_PLACEHOLDERS = {
+    'description': 'The following placeholders need to be filled:',
+    'types': {
+        'NAME': 'Recipient\'s name',
+        'DATE': 'Specific date',
+        'TIME': 'Specific time',
+        'COMPANY': 'Company name',
+        'DETAILS': 'Additional details'
+    }
+}
+
 # Initialize services
 gmail_client = None
 llm_responder = None
 file_processor = None
+analysis_pipeline = None
+message_store = None
+analysis_store = None
+inbox_sync = None
+attachment_store = None
+job_queue = None
+ranking_engine = None
+reply_prefetcher = None
+gmail_executor = None
+# Created at import so route timings are recorded before the services are initialized
+metrics = Metrics()
 
 def init_services():
-    global gmail_client, llm_responder, file_processor
+    global gmail_client, llm_responder, file_processor, analysis_pipeline, message_store, inbox_sync
+    global attachment_store, job_queue, ranking_engine, analysis_store, reply_prefetcher, gmail_executor
+    
+    if not attachment_store:
+        attachment_store = AttachmentStore(
+            Config.ATTACHMENT_STORE_DIR,
+            max_bytes=Config.ATTACHMENT_STORE_MAX_BYTES,
+            inline_max_bytes=Config.ATTACHMENT_INLINE_MAX_BYTES
+        )
     
     if not gmail_client:
         gmail_client = GmailClient(
             creds_path=Config.GMAIL_CREDENTIALS_PATH,
-            token_path=Config.GMAIL_TOKEN_PATH
+            token_path=Config.GMAIL_TOKEN_PATH,
+            attachment_store=attachment_store,
+            metrics=metrics
+        )
+    
+    if not gmail_executor:
+        # Long-lived, so each thread keeps its Gmail service and keep-alive connection across requests
+        gmail_executor = ThreadPoolExecutor(max_workers=Config.GMAIL_MAX_WORKERS, thread_name_prefix='gmail')
+    
+    if not file_processor:
+        file_processor = FileProcessor(
+            max_pages=Config.PDF_MAX_PAGES,
+            max_workers=Config.PDF_MAX_WORKERS or None
         )
     
     if not llm_responder:
         genai.configure(api_key=Config.GEMINI_API_KEY)
         model = genai.GenerativeModel(model_name=Config.GEMINI_MODEL)
-        llm_responder = LLMResponder(model, signature=Config.DEFAULT_SIGNATURE)
+        cache = LLMCache(
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            ttl=Config.LLM_CACHE_TTL,
+            disk_path=Config.LLM_CACHE_PATH or None,
+            max_disk_entries=Config.LLM_CACHE_MAX_DISK_ENTRIES
+        )
+        rate_limiter = RateLimiter(
+            requests_per_minute=Config.GEMINI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=Config.GEMINI_TOKENS_PER_MINUTE,
+            state_path=Config.GEMINI_RATE_LIMIT_STATE_PATH or None,
+            max_concurrency=Config.ANALYSIS_MAX_WORKERS
+        )
+        llm_responder = LLMResponder(
+            model,
+            signature=Config.DEFAULT_SIGNATURE,
+            cache=cache,
+            attachment_store=attachment_store,
+            rate_limiter=rate_limiter,
+            file_processor=file_processor,
+            summary_max_chars=Config.SUMMARY_MAX_INPUT_CHARS,
+            summary_mode=Config.SUMMARY_MODE,
+            summary_chunk_chars=Config.SUMMARY_CHUNK_CHARS,
+            summary_token_budget=Config.SUMMARY_TOKEN_BUDGET,
+            summary_max_workers=Config.SUMMARY_MAX_WORKERS,
+            profiler=TabularProfiler(
+                max_rows=Config.PROFILE_MAX_ROWS,
+                chunk_rows=Config.PROFILE_CSV_CHUNK_ROWS
+            ),
+            metrics=metrics
+        )
+        metrics.add_collector(lambda: _cache_metrics('llm', cache.stats()))
+        metrics.add_collector(lambda: _rate_limiter_metrics('sync', rate_limiter.stats()))
     
-    if not file_processor:
-        file_processor = FileProcessor()
+    if not analysis_pipeline:
+        scorer = None
+        if Config.PRESCORE_ENABLED:
+            scorer = HeuristicScorer(
+                llm_responder.urgency_keywords,
+                low_signal_domains=Config.LOW_SIGNAL_SENDER_DOMAINS,
+                important_domains=Config.IMPORTANT_SENDER_DOMAINS,
+                threshold=Config.PRESCORE_SKIP_THRESHOLD
+            )
+        analysis_pipeline = EmailAnalysisPipeline(
+            llm_responder,
+            max_workers=Config.ANALYSIS_MAX_WORKERS,
+            scorer=scorer
+        )
+    
+    if not analysis_store:
+        analysis_store = AnalysisStore(Config.ANALYSIS_STORE_PATH)
+        if Config.ANALYSIS_STORE_MAX_AGE_DAYS:
+            analysis_store.prune(Config.ANALYSIS_STORE_MAX_AGE_DAYS * 24 * 3600)
+    
+    if not ranking_engine:
+        ranking_engine = RankingEngine(sender_weights=Config.SENDER_WEIGHTS)
+    
+    if not job_queue:
+        job_queue = JobQueue(
+            Config.JOB_STORE_PATH,
+            _process_upload_job,
+            max_workers=Config.JOB_MAX_WORKERS
+        )
+        metrics.add_collector(lambda: [('jobs_running', {}, job_queue.stats()['running'])])
+    
+    if Config.REPLY_PREFETCH_TOP_K > 0 and not reply_prefetcher:
+        reply_prefetcher = ReplyPrefetcher(
+            llm_responder,
+            top_k=Config.REPLY_PREFETCH_TOP_K,
+            num_options=Config.REPLY_PREFETCH_NUM_OPTIONS,
+            hourly_budget=Config.REPLY_PREFETCH_HOURLY_BUDGET,
+            max_entries=Config.REPLY_PREFETCH_MAX_ENTRIES,
+            ttl=Config.REPLY_PREFETCH_TTL,
+            max_workers=Config.REPLY_PREFETCH_MAX_WORKERS
+        )
+        metrics.add_collector(lambda: _prefetch_metrics(reply_prefetcher.stats()))
+    
+    if Config.INBOX_SYNC_MODE == 'incremental' and not inbox_sync:
+        message_store = MessageStore(Config.MESSAGE_STORE_PATH)
+        inbox_sync = InboxSync(gmail_client, message_store, max_results=Config.INBOX_PAGE_SIZE)
+
+def _cache_metrics(name, stats):
+    """Metric samples for a cache's stats() counters"""
+    return [
+        ('cache_hits_total', {'cache': name}, stats['hits']),
+        ('cache_misses_total', {'cache': name}, stats['misses']),
+        ('cache_hit_ratio', {'cache': name}, stats['hit_ratio']),
+        ('cache_entries', {'cache': name}, stats['memory_entries'])
+    ]
+
+def _rate_limiter_metrics(name, stats):
+    """Metric samples for a Gemini rate limiter, labelled 'sync' or 'async'"""
+    return [
+        ('rate_limiter_in_flight', {'limiter': name}, stats['in_flight']),
+        ('rate_limiter_concurrency_limit', {'limiter': name}, stats['concurrency_limit']),
+        ('rate_limiter_throttled_total', {'limiter': name}, stats['throttled']),
+        ('rate_limiter_queue_wait_seconds_total', {'limiter': name}, stats['queue_wait_total'])
+    ]
+
+def _prefetch_metrics(stats):
+    """Metric samples for the reply prefetcher"""
+    samples = _cache_metrics('reply_prefetch', stats)
+    samples.extend(
+        ('reply_prefetch_total', {'outcome': outcome}, count) for outcome, count in stats['outcomes'].items()
+    )
+    return samples
+
+def _process_upload_job(payload, progress):
+    """Background job: summarize an uploaded file stored in the attachment store, then unpin it"""
+    try:
+        analysis = llm_responder.analyze_attachment(
+            payload['path'],
+            payload['file_type'],
+            payload['sha256'],
+            progress=progress
+        )
+    finally:
+        attachment_store.unpin(payload['sha256'])
+    return {
+        'filename': payload['filename'],
+        'file_type': payload['file_type'],
+        'summary': analysis['summary'],
+        'sentiment': analysis['sentiment']
+    }
+
+def _download_attachments(messages):
+    """Download attachments for each parsed message concurrently, skipping messages whose download fails"""
+    def download(message):
+        try:
+            return gmail_client.get_attachments(message)
+        except Exception as e:
+            print(f"Error downloading attachments for email {message.id}: {str(e)}")
+            return []
+    
+    # Only messages that have attachments need a Gmail round trip
+    with_attachments = [message for message in messages if message.attachments]
+    attachments = {message.id: [] for message in messages}
+    for message, result in zip(with_attachments, gmail_executor.map(download, with_attachments)):
+        attachments[message.id] = result
+    return attachments
+
+def _page_args(args):
+    """Page size and page token of an inbox request, with the size clamped to the configured maximum"""
+    page_size = args.get('page_size', Config.INBOX_PAGE_SIZE, type=int)
+    page_size = min(max(page_size, 1), Config.INBOX_MAX_PAGE_SIZE)
+    return page_size, args.get('page_token') or None
+
+def _refresh_arg(args):
+    """Whether an inbox request asked for every email on the page to be analyzed again"""
+    return args.get('refresh', '').lower() in ('1', 'true')
+
+def _list_inbox_page(page_size, page_token=None):
+    """Return (ids of one page of unread inbox messages, messages already fetched by id, next page token).
+
+    In incremental sync mode the first page comes from the local store.
+    """
+    if inbox_sync and not page_token:
+        messages, next_page_token = inbox_sync.refresh(page_size)
+        return [message.id for message in messages], {message.id: message for message in messages}, next_page_token
+    msg_ids, next_page_token = gmail_client.list_unread_page(page_size, page_token)
+    return msg_ids, {}, next_page_token
+
+def _stored_analyses(msg_ids, messages, refresh=False):
+    """Stored analyses that may be served for a page of message ids.
+
+    Analyses saved more than ANALYSIS_REFRESH_DAYS ago are left out, as are
+    ones whose subject or body differ from a message in `messages`, so both
+    are recomputed; `refresh` recomputes every one.
+    """
+    if refresh:
+        return {}
+    analyses = analysis_store.get(msg_ids, max_age=Config.ANALYSIS_REFRESH_DAYS * 86400)
+    for msg_id, message in messages.items():
+        stored = analyses.get(msg_id)
+        if stored and (stored.get('subject'), stored.get('body')) != (message.subject, message.body):
+            del analyses[msg_id]
+    return analyses
+
+def _iter_inbox_analyses(msg_ids, messages, refresh=False):
+    """Yield (page position, analysis) pairs for a page of message ids as they become ready.
+
+    Messages with a current stored analysis are yielded first without being
+    fetched; only the rest are fetched from Gmail, unless already in
+    `messages`, and sent to the LLM.
+    """
+    analyses = _stored_analyses(msg_ids, messages, refresh)
+    to_fetch = [msg_id for msg_id in msg_ids if msg_id not in analyses and msg_id not in messages]
+    if to_fetch:
+        messages = dict(messages)
+        messages.update((message.id, message) for message in gmail_client.get_messages(to_fetch))
+
+    pending = []
+    for position, msg_id in enumerate(msg_ids):
+        if msg_id in analyses:
+            yield position, analyses[msg_id]
+        elif msg_id in messages:
+            pending.append((position, messages[msg_id]))
+
+    # Download attachments up front, in parallel across the client's per-thread connections
+    attachments = _download_attachments([message for _, message in pending])
+
+    # Run the LLM analyses for all new emails concurrently
+    emails = [message.to_dict() for _, message in pending]
+    for index, analysis in analysis_pipeline.iter_analyze(emails, attachments):
+        if 'analysis_error' not in analysis:
+            analysis_store.save([analysis])
+        yield pending[index][0], analysis
+
+def _analyze_inbox(page_size, page_token=None, refresh=False):
+    """Analyze one page of the unread inbox; returns (analyses in inbox order, next page token)"""
+    msg_ids, messages, next_page_token = _list_inbox_page(page_size, page_token)
+    analyses = dict(_iter_inbox_analyses(msg_ids, messages, refresh))
+    return [analyses[position] for position in sorted(analyses)], next_page_token
+
+def _rank_emails(summaries):
+    """Rank analyzed emails by importance, locally unless the LLM ranker is configured"""
+    if Config.RANKING_MODE == 'llm':
+        ranked_indices = llm_responder.rank_emails_by_importance(summaries)
+    else:
+        ranked_indices = ranking_engine.rank(summaries)
+    return [summaries[i] for i in ranked_indices]
+
+def _prefetch_replies(ranked_emails, first_page):
+    """Start generating reply options for the top ranked emails, replacing stale work on a fresh first page"""
+    if reply_prefetcher:
+        reply_prefetcher.prefetch(ranked_emails, replace=first_page)
+
+def _reply_options(email_body, sender_name, num_options):
+    """Reply options for an email, prefetched when possible and otherwise generated now"""
+    options = reply_prefetcher.get(email_body, sender_name, num_options) if reply_prefetcher else None
+    if options is None:
+        options = llm_responder.generate_reply_options(
+            email_body,
+            sender_name=sender_name,
+            num_options=num_options
+        )
+        if reply_prefetcher:
+            reply_prefetcher.put(email_body, sender_name, num_options, options)
+    return options
+
+def _analysis_summary(ranked_emails):
+    """Aggregate counts shown above the email list"""
+    return {
+        'total_emails': len(ranked_emails),
+        'urgent_count': sum(1 for e in ranked_emails if e['priority_analysis']['urgency_score'] >= 4),
+        'important_count': sum(1 for e in ranked_emails if e['priority_analysis']['importance_score'] >= 4),
+        'sentiment_distribution': {
+            'positive': sum(1 for e in ranked_emails if e['sentiment']['primary_emotion'] in ['Joy', 'Gratitude', 'Excitement']),
+            'negative': sum(1 for e in ranked_emails if e['sentiment']['primary_emotion'] in ['Anger', 'Frustration', 'Disappointment']),
+            'neutral': sum(1 for e in ranked_emails if e['sentiment']['primary_emotion'] in ['Neutral', 'Professional', 'Formal'])
+        }
+    }
+
+@main.before_request
+def _start_request_metrics():
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    metrics.inc('http_requests_in_flight', route=g.metrics_route)
+
+@main.after_request
+def _record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@main.teardown_request
+def _finish_request_metrics(exception):
+    """Record route latency; streamed responses are timed until the stream ends"""
+    if 'metrics_start' not in g:
+        return
+    metrics.dec('http_requests_in_flight', route=g.metrics_route)
+    metrics.observe(
+        'http_request_duration_seconds',
+        time.perf_counter() - g.metrics_start,
+        route=g.metrics_route,
+        method=request.method,
+        status=g.get('metrics_status', 500)
+    )
+
+@main.route('/metrics')
+def get_metrics():
+    """Expose request, LLM, Gmail, cache and rate limiter metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @main.route('/')
 def index():
@@ -62,12 +396,8 @@ def auth():
             )
             flow.fetch_token(code=code)
             
-            # Save the credentials
-            with open(Config.GMAIL_TOKEN_PATH, 'wb') as token:
-                pickle.dump(flow.credentials, token)
-            
-            # Initialize the Gmail client with new credentials
-            gmail_client.service = build('gmail', 'v1', credentials=flow.credentials)
+            # Save the credentials and hand them to the Gmail client
+            gmail_client.set_credentials(flow.credentials, persist=True)
             return jsonify({'status': 'success'})
         else:
             # Initial authentication request
@@ -83,80 +413,117 @@ def auth():
 
 @main.route('/emails')
 def get_emails():
-    """Get unread emails with enhanced analysis"""
-    if not all([gmail_client, llm_responder, file_processor]):
+    """Get one page of unread emails with enhanced analysis.
+
+    Query parameters: page_size (default INBOX_PAGE_SIZE), page_token, the
+    next_page_token of the previous page, and refresh=1 to analyze every email
+    again instead of serving stored analyses. The ranking and summary cover the page.
+    """
+    if not all([gmail_client, llm_responder, file_processor, analysis_pipeline, analysis_store, gmail_executor]):
         init_services()
     
     try:
-        emails = gmail_client.get_unread_emails()
-        summaries = []
-        
-        for email in emails:
-            # Get attachments and process them
-            attachments = gmail_client.get_attachments(email['id'])
-            attachment_summaries = []
-            
-            for attachment in attachments:
-                file_type = attachment.split('.')[-1].lower()
-                summary = llm_responder.process_attachment(attachment, file_type)
-                attachment_summaries.append({
-                    'filename': attachment.split('/')[-1],
-                    'summary': summary,
-                    'sentiment': llm_responder.detect_sentiment(summary)
-                })
-            
-            # Analyze email priority
-            priority_analysis = llm_responder.analyze_email_priority(
-                email['subject'],
-                email['body'],
-                email['from']
-            )
-            
-            # Analyze sentiment
-            sentiment_analysis = llm_responder.detect_sentiment(email['body'])
-            
-            # Generate summary
-            summary = llm_responder.summarize_text(
-                email['body'],
-                prefix="Summarize this email and extract key points:"
-            )
-            
-            summaries.append({
-                'id': email['id'],
-                'from': email['from'],
-                'subject': email['subject'],
-                'body': email['body'],
-                'summary': summary,
-                'priority_analysis': priority_analysis,
-                'sentiment': sentiment_analysis,
-                'attachments': attachment_summaries,
-                'suggested_response_time': priority_analysis['suggested_response_time']
-            })
+        page_size, page_token = _page_args(request.args)
+        summaries, next_page_token = _analyze_inbox(page_size, page_token, _refresh_arg(request.args))
         
         # Rank emails by importance with enhanced analysis
-        ranked_indices = llm_responder.rank_emails_by_importance(summaries)
-        ranked_emails = [summaries[i] for i in ranked_indices]
+        ranked_emails = _rank_emails(summaries)
+        _prefetch_replies(ranked_emails, first_page=not page_token)
         
         return jsonify({
             'status': 'success',
             'emails': ranked_emails,
-            'analysis_summary': {
-                'total_emails': len(ranked_emails),
-                'urgent_count': sum(1 for e in ranked_emails if e['priority_analysis']['urgency_score'] >= 4),
-                'important_count': sum(1 for e in ranked_emails if e['priority_analysis']['importance_score'] >= 4),
-                'sentiment_distribution': {
-                    'positive': sum(1 for e in ranked_emails if e['sentiment']['primary_emotion'] in ['Joy', 'Gratitude', 'Excitement']),
-                    'negative': sum(1 for e in ranked_emails if e['sentiment']['primary_emotion'] in ['Anger', 'Frustration', 'Disappointment']),
-                    'neutral': sum(1 for e in ranked_emails if e['sentiment']['primary_emotion'] in ['Neutral', 'Professional', 'Formal'])
-                }
-            }
+            'analysis_summary': _analysis_summary(ranked_emails),
+            'next_page_token': next_page_token
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@main.route('/emails/stream')
+def stream_emails():
+    """Stream one page of analyzed emails as NDJSON events, followed by the page's ranking.
+
+    Takes the same page_size, page_token and refresh parameters as /emails.
+    """
+    if not all([gmail_client, llm_responder, file_processor, analysis_pipeline, analysis_store, gmail_executor]):
+        init_services()
+    page_size, page_token = _page_args(request.args)
+    refresh = _refresh_arg(request.args)
+    
+    def generate():
+        try:
+            msg_ids, messages, next_page_token = _list_inbox_page(page_size, page_token)
+            analyses = {}
+            for position, summary in _iter_inbox_analyses(msg_ids, messages, refresh):
+                analyses[position] = summary
+                yield json.dumps({'type': 'email', 'email': summary}) + '\n'
+            
+            # Rank in inbox order so the result matches /emails
+            ranked_emails = _rank_emails([analyses[position] for position in sorted(analyses)])
+            _prefetch_replies(ranked_emails, first_page=not page_token)
+            yield json.dumps({
+                'type': 'ranking',
+                'ranked_ids': [e['id'] for e in ranked_emails],
+                'analysis_summary': _analysis_summary(ranked_emails),
+                'next_page_token': next_page_token
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'message': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _parse_time(value):
+    """Epoch seconds from epoch seconds, an ISO date or time, or a lookback such as '7d' or '12h'"""
+    units = {'h': 3600, 'd': 86400, 'w': 7 * 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+@main.route('/analyses')
+def query_analyses():
+    """Filter and sort stored email analyses without contacting Gmail or the LLM.
+
+    Example: /analyses?min_urgency=4&domain=example.com&since=7d&sort=-urgency,-received
+    """
+    if not analysis_store:
+        init_services()
+    
+    try:
+        args = request.args
+        response_times = [t.strip() for t in args.get('response_time', '').split(',') if t.strip()]
+        sort = [field.strip() for field in args.get('sort', '').split(',') if field.strip()]
+        emails = analysis_store.query(
+            min_urgency=args.get('min_urgency', type=int),
+            min_importance=args.get('min_importance', type=int),
+            sender=args.get('sender'),
+            domain=args.get('domain'),
+            response_times=response_times,
+            since=_parse_time(args['since']) if args.get('since') else None,
+            until=_parse_time(args['until']) if args.get('until') else None,
+            sort=sort,
+            limit=min(max(args.get('limit', 50, type=int), 1), 500),
+            offset=max(args.get('offset', 0, type=int), 0)
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    return jsonify({
+        'status': 'success',
+        'emails': emails,
+        'analysis_summary': _analysis_summary(emails)
+    })
+
 @main.route('/suggest-reply', methods=['POST'])
 def suggest_reply():
-    """Generate personalized reply suggestions with placeholders"""
+    """Generate personalized reply suggestions with placeholders, served from the prefetch cache when ready"""
     if not llm_responder:
         init_services()
     
@@ -166,25 +533,12 @@ def suggest_reply():
         sender_name = data.get('sender_name')
         num_options = data.get('num_options', 3)
         
-        options = llm_responder.generate_reply_options(
-            email_body,
-            sender_name=sender_name,
-            num_options=num_options
-        )
+        options = _reply_options(email_body, sender_name, num_options)
         
         return jsonify({
             'status': 'success',
             'options': options,
-            'placeholders': {
-                'description': 'The following placeholders need to be filled:',
-                'types': {
-                    'NAME': 'Recipient\'s name',
-                    'DATE': 'Specific date',
-                    'TIME': 'Specific time',
-                    'COMPANY': 'Company name',
-                    'DETAILS': 'Additional details'
-                }
-            }
+            'placeholders': REPLY_PLACEHOLDERS
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -313,7 +667,7 @@ def next_email():
 @main.route('/upload-file', methods=['POST'])
 def upload_file():
     """Handle file uploads and process them"""
-    if not all([llm_responder, file_processor]):
+    if not all([llm_responder, file_processor, attachment_store, job_queue]):
         init_services()
     
     try:
@@ -336,45 +690,50 @@ def upload_file():
                 'message': f'Unsupported file type. Supported types are: {", ".join(supported_types)}'
             }), 400
             
-        # Ensure upload folder exists
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder, exist_ok=True)
-            
-        # Save file to uploads directory
-        upload_path = os.path.join(upload_folder, filename)
-        
+        # Save file to the content-addressed store; identical uploads share one blob.
+        # Uploads are always persisted and pinned until their job has run, so a queued
+        # job survives both a worker restart and attachment store eviction.
         try:
-            file.save(upload_path)
+            stored = attachment_store.put(file.read(), filename, persist=True, pin=True)
         except Exception as e:
             return jsonify({
                 'status': 'error',
                 'message': f'Failed to save file: {str(e)}'
             }), 500
             
-        # Process the file
+        # Process the file in the background; the client polls /jobs/<job_id>
         try:
-            summary = llm_responder.process_attachment(upload_path, file_ext)
-            sentiment = llm_responder.detect_sentiment(summary)
-        except Exception as e:
-            return jsonify({
-                'status': 'error',
-                'message': f'Failed to process file: {str(e)}'
-            }), 500
+            job_id = job_queue.submit({
+                'path': stored['path'],
+                'sha256': stored['sha256'],
+                'filename': filename,
+                'file_type': file_ext
+            })
+        except Exception:
+            attachment_store.unpin(stored['sha256'])
+            raise
         
         return jsonify({
-            'status': 'success',
-            'file_info': {
-                'filename': filename,
-                'file_type': file_ext,
-                'summary': summary,
-                'sentiment': sentiment
-            }
-        })
+            'status': 'accepted',
+            'job_id': job_id,
+            'status_url': url_for('main.get_job', job_id=job_id)
+        }), 202
         
     except Exception as e:
         current_app.logger.error(f"Upload error: {str(e)}")
         return jsonify({
             'status': 'error',
             'message': f'Upload failed: {str(e)}'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@main.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Report the status and, once finished, the result of a background job"""
+    if not job_queue:
+        init_services()
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    
+    return jsonify({'status': 'success', 'job': job})
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from email.utils import parseaddr
+
+# Columns a query may sort on, mapped to their SQL expression
+SORT_COLUMNS = {
+    'received': 'received',
+    'urgency': 'urgency',
+    'importance': 'importance',
+    'sender': 'sender',
+    'updated': 'updated'
+}
+
+
+class AnalysisStore:
+    """SQLite store of email analyses keyed by Gmail message id.
+
+    The full analysis is kept as JSON next to indexed columns for urgency,
+    importance, sender address and domain, received time and suggested
+    response time, so dashboard queries are filtered and sorted by SQLite
+    without refetching or re-analyzing any email. Reads record when each
+    analysis was last served, so pruning only drops analyses nobody reads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "id TEXT PRIMARY KEY, sender TEXT NOT NULL, sender_domain TEXT NOT NULL, "
+                "received REAL, urgency INTEGER, importance INTEGER, response_time TEXT, "
+                "analysis TEXT NOT NULL, updated REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_urgency ON analyses (urgency, received)")
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_importance ON analyses (importance, received)")
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_sender ON analyses (sender, received)")
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_sender_domain ON analyses (sender_domain, received)")
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_received ON analyses (received)")
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_response_time ON analyses (response_time, received)")
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed)")
+
+    def _connect(self):
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, analyses):
+        """Insert or replace analyses as returned by EmailAnalysisPipeline"""
+        now = time.time()
+        rows = []
+        for analysis in analyses:
+            sender = parseaddr(analysis.get('from', ''))[1].lower()
+            priority = analysis.get('priority_analysis') or {}
+            rows.append((
+                analysis['id'],
+                sender,
+                sender.partition('@')[2],
+                analysis.get('received'),
+                _score(priority.get('urgency_score')),
+                _score(priority.get('importance_score')),
+                priority.get('suggested_response_time') or analysis.get('suggested_response_time'),
+                json.dumps(analysis),
+                now,
+                now
+            ))
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO analyses (id, sender, sender_domain, received, urgency, importance, "
+                "response_time, analysis, updated, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get(self, msg_ids, max_age=None):
+        """Return a dict of message id -> stored analysis for the ids that have one.
+
+        Analyses saved more than `max_age` seconds ago are left out, so the
+        caller recomputes them. The ones returned are marked as accessed.
+        """
+        msg_ids = list(msg_ids)
+        analyses = {}
+        now = time.time()
+        cutoff = now - max_age if max_age else 0
+        conn = self._connect()
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(msg_ids), 500):
+            batch = msg_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, analysis FROM analyses WHERE id IN ({', '.join('?' * len(batch))}) AND updated >= ?",
+                batch + [cutoff]
+            ).fetchall()
+            analyses.update((row[0], json.loads(row[1])) for row in rows)
+        if analyses:
+            with conn:
+                conn.executemany("UPDATE analyses SET accessed = ? WHERE id = ?", [(now, i) for i in analyses])
+        return analyses
+
+    def query(self, min_urgency=None, min_importance=None, sender=None, domain=None, response_times=None,
+              since=None, until=None, sort=None, limit=50, offset=0):
+        """Return stored analyses matching every given filter.
+
+        `sender` is an exact address and `domain` an exact sender domain;
+        `since` and `until` bound the received time in epoch seconds. `sort`
+        is a list of SORT_COLUMNS names, each optionally prefixed with '-'
+        for descending order; newest first by default.
+        """
+        clauses = []
+        params = []
+        if min_urgency is not None:
+            clauses.append("urgency >= ?")
+            params.append(min_urgency)
+        if min_importance is not None:
+            clauses.append("importance >= ?")
+            params.append(min_importance)
+        if sender:
+            clauses.append("sender = ?")
+            params.append(sender.lower())
+        if domain:
+            clauses.append("sender_domain = ?")
+            params.append(domain.lower().lstrip('@'))
+        if response_times:
+            clauses.append(f"response_time IN ({', '.join('?' * len(response_times))})")
+            params.extend(response_times)
+        if since is not None:
+            clauses.append("received >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("received < ?")
+            params.append(until)
+
+        order = []
+        for field in sort or ['-received']:
+            column = SORT_COLUMNS.get(field.lstrip('-'))
+            if column is None:
+                raise ValueError(f"Cannot sort by {field}; choose from {', '.join(SORT_COLUMNS)}")
+            order.append(f"{column} {'DESC' if field.startswith('-') else 'ASC'}")
+        order.append("id")
+
+        sql = "SELECT analysis FROM analyses"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {', '.join(order)} LIMIT ? OFFSET ?"
+        rows = self._connect().execute(sql, params + [limit, offset]).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def prune(self, max_age):
+        """Delete analyses neither saved nor read in the last max_age seconds; returns the number removed"""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM analyses WHERE accessed < ?", (time.time() - max_age,)
+            ).rowcount
+
+
+def _score(value):
+    """Integer 1-5 score from an LLM field, or None when it is missing or malformed"""
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
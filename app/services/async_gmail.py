@@ -0,0 +1,125 @@
+import time
+import random
+import asyncio
+import httpx
+from app.services.gmail import ParsedMessage, RETRYABLE_STATUSES, MAX_LIST_RESULTS
+
+GMAIL_API_URL = 'https://gmail.googleapis.com/gmail/v1/users/me/'
+
+
+class AsyncGmailClient:
+    """Gmail REST client for asyncio that shares a GmailClient's credentials and attachment handling.
+
+    Every request goes through one pooled httpx.AsyncClient, so any number
+    of coroutines share at most `max_connections` keep-alive connections,
+    and at most `max_concurrency` calls are in flight to stay inside Gmail's
+    per-user concurrency limit. Messages are fetched with concurrent GETs
+    rather than the batch endpoint. Token refreshes and attachment storage
+    run in the default executor.
+    """
+
+    def __init__(self, gmail_client, max_connections=20, max_concurrency=10, timeout=60, max_attempts=3,
+                 transport=None):
+        self.gmail = gmail_client
+        self.metrics = gmail_client.metrics
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=GMAIL_API_URL,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _access_token(self):
+        """Return a valid access token from the shared credentials, loading or refreshing them if needed"""
+        if self.gmail.credentials is None:
+            await asyncio.to_thread(self.gmail.authenticate)
+        credentials = self.gmail.credentials
+        if not credentials.valid:
+            await asyncio.to_thread(self.gmail._refresh_credentials)
+        return credentials.token
+
+    async def _request(self, http_method, path, method, **kwargs):
+        """Send an API request, retrying rate limits and server errors with backoff; returns the JSON body"""
+        headers = {'Authorization': f"Bearer {await self._access_token()}"}
+        for attempt in range(self.max_attempts):
+            async with self._semaphore:
+                response = await self._send(http_method, path, method, headers=headers, **kwargs)
+            if response.status_code not in RETRYABLE_STATUSES or attempt + 1 == self.max_attempts:
+                break
+            await asyncio.sleep(2 ** attempt + random.uniform(0, 1))
+        response.raise_for_status()
+        return response.json()
+
+    async def _send(self, http_method, path, method, **kwargs):
+        """Send one HTTP request, recording its count, status and latency like GmailClient._execute"""
+        if self.metrics is None:
+            return await self._http.request(http_method, path, **kwargs)
+        self.metrics.inc('gmail_api_in_flight')
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = await self._http.request(http_method, path, **kwargs)
+            if response.is_success:
+                status = 'ok'
+            return response
+        finally:
+            self.metrics.dec('gmail_api_in_flight')
+            self.metrics.inc('gmail_api_calls_total', method=method, status=status)
+            self.metrics.observe('gmail_api_duration_seconds', time.perf_counter() - start, method=method)
+
+    async def list_unread_page(self, max_results=10, page_token=None):
+        """Return (ids of one page of unread inbox messages, newest first, next page token or None)"""
+        params = {'labelIds': 'INBOX', 'q': 'is:unread', 'maxResults': min(max_results, MAX_LIST_RESULTS)}
+        if page_token:
+            params['pageToken'] = page_token
+        response = await self._request('GET', 'messages', 'messages.list', params=params)
+        return [msg['id'] for msg in response.get('messages', [])], response.get('nextPageToken')
+
+    async def get_unread_page(self, max_results=10, page_token=None):
+        """Return (one page of unread inbox messages as ParsedMessage objects, next page token)"""
+        msg_ids, next_page_token = await self.list_unread_page(max_results, page_token)
+        return await self.get_messages(msg_ids), next_page_token
+
+    async def get_messages(self, msg_ids):
+        """Fetch specific messages concurrently as ParsedMessage objects, skipping ones that fail"""
+        async def fetch(msg_id):
+            try:
+                return ParsedMessage(await self._request(
+                    'GET', f"messages/{msg_id}", 'messages.get', params={'format': 'full'}))
+            except Exception as e:
+                print(f"Error fetching email {msg_id}: {str(e)}")
+                return None
+
+        messages = await asyncio.gather(*(fetch(msg_id) for msg_id in dict.fromkeys(msg_ids)))
+        return [message for message in messages if message is not None]
+
+    async def get_attachments(self, message):
+        """Download a message's attachments concurrently; returns records like GmailClient.get_attachments"""
+        if not isinstance(message, ParsedMessage):
+            message = ParsedMessage(await self._request(
+                'GET', f"messages/{message}", 'messages.get', params={'format': 'full'}))
+
+        async def download(attachment):
+            data = attachment['data']
+            if data is None:
+                data = (await self._request(
+                    'GET', f"messages/{message.id}/attachments/{attachment['attachment_id']}",
+                    'messages.attachments.get'))['data']
+            return await asyncio.to_thread(self.gmail._store_attachment, data, attachment['filename'])
+
+        return list(await asyncio.gather(*(download(attachment) for attachment in message.attachments)))
+
+    async def send_email(self, to, subject, body):
+        """Send email using Gmail API"""
+        message = self.gmail.create_message(to, subject, body)
+        return await self._request('POST', 'messages/send', 'messages.send', json=message)
+
+    async def mark_as_read(self, msg_id):
+        """Mark an email as read"""
+        await self._request('POST', f"messages/{msg_id}/modify", 'messages.modify',
+                            json={'removeLabelIds': ['UNREAD']})
@@ -0,0 +1,202 @@
+import random
+import asyncio
+import functools
+import contextlib
+from google.api_core.exceptions import TooManyRequests
+from app.services.llm import (
+    DEFAULT_PRIORITY, DEFAULT_SENTIMENT, DOCUMENT_PREFIXES, _current_method, _method_metrics,
+    _attachment_error
+)
+from app.services.ratelimit import estimate_tokens
+
+
+def _instrumented(method):
+    """Async counterpart of llm._instrumented"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return await method(self, *args, **kwargs)
+        with _method_metrics(self.metrics, name):
+            return await method(self, *args, **kwargs)
+    return wrapper
+
+
+class AsyncLLMResponder:
+    """Coroutine front end for an LLMResponder.
+
+    Wraps a sync responder and reuses its prompts, parsing, cache, stores,
+    metrics and settings; only model calls differ, going through the SDK's
+    async generate path so a single event loop can keep many of them in
+    flight without a thread each. Cache and attachment store lookups,
+    text extraction and spreadsheet profiling run in the default executor.
+    """
+
+    def __init__(self, responder, rate_limiter=None):
+        self.responder = responder
+        self.model = responder.model
+        self.metrics = responder.metrics
+        self.attachment_store = responder.attachment_store
+        self.rate_limiter = rate_limiter if rate_limiter is not None else responder.rate_limiter
+
+    async def _retry_generate(self, prompt, max_attempts=3):
+        """Retry mechanism for rate-limited LLM requests, served from the cache when possible"""
+        method = _current_method.get()
+        cache_key, cached = await asyncio.to_thread(self.responder._cache_lookup, prompt, method)
+        if cached is not None:
+            return cached
+
+        for attempt in range(max_attempts):
+            if attempt:
+                self.responder._record('llm_retries_total', method=method)
+            try:
+                async with self._rate_limit_async(prompt):
+                    with self.responder._generate_timer():
+                        response = await self.model.generate_content_async(prompt)
+                return await asyncio.to_thread(self.responder._generated, response.text.strip(), cache_key, method)
+            except TooManyRequests:
+                self.responder._record('llm_generate_total', method=method, outcome='throttled')
+                if self.rate_limiter is None:
+                    await asyncio.sleep(2 ** attempt + random.uniform(0, 1))
+            except Exception:
+                self.responder._record('llm_generate_total', method=method, outcome='error')
+                raise
+        raise Exception("Rate limit exceeded")
+
+    def _rate_limit_async(self, prompt):
+        """Reserve rate limiter budget for a prompt without blocking the event loop"""
+        if self.rate_limiter is None:
+            return contextlib.nullcontext()
+        return self.rate_limiter.limit_async(estimate_tokens(prompt))
+
+    @_instrumented
+    async def analyze_email_priority(self, email_subject, email_body, sender):
+        """Analyze email priority based on content and sender"""
+        try:
+            return self.responder._parse_priority(await self._retry_generate(
+                self.responder._priority_prompt(email_subject, email_body, sender)))
+        except Exception as e:
+            return dict(DEFAULT_PRIORITY, reason=f'Error in priority analysis: {str(e)}')
+
+    @_instrumented
+    async def analyze_email(self, email_subject, email_body, sender):
+        """Analyze priority, sentiment and summary of an email in a single request, as LLMResponder.analyze_email"""
+        response = await self._retry_generate(self.responder._analysis_prompt(email_subject, email_body, sender))
+        try:
+            return self.responder._validate_analysis(self.responder._extract_json(response))
+        except ValueError as e:
+            print(f"Fused analysis failed, falling back to separate requests: {str(e)}")
+            priority, sentiment, summary = await asyncio.gather(
+                self.analyze_email_priority(email_subject, email_body, sender),
+                self.detect_sentiment(email_body),
+                self.summarize_text(email_body, prefix="Summarize this email and extract key points:")
+            )
+            return {'priority_analysis': priority, 'sentiment': sentiment, 'summary': summary}
+
+    @_instrumented
+    async def detect_sentiment(self, text):
+        """Enhanced sentiment analysis with detailed emotional tone detection"""
+        try:
+            return self.responder._parse_sentiment(await self._retry_generate(self.responder._sentiment_prompt(text)))
+        except Exception:
+            return dict(DEFAULT_SENTIMENT)
+
+    @_instrumented
+    async def summarize_text(self, text, prefix="Summarize this text:", max_length=None, mode=None):
+        """Summarize text, map-reducing long text as LLMResponder.summarize_text does"""
+        text = text.strip()
+        mode = mode or self.responder.summary_mode
+        if mode == 'map_reduce' and len(text) > self.responder.summary_chunk_chars:
+            return await self._map_reduce_summary(text, prefix)
+        return await self._retry_generate(self.responder._summary_prompt(text, prefix, max_length, mode)) or "No summary available."
+
+    async def _map_reduce_summary(self, text, prefix):
+        """Summarize long text hierarchically: chunk summaries, merged until they fit one prompt"""
+        chunks = self.responder._summary_chunks(text)
+        if len(chunks) == 1:
+            return await self.summarize_text(chunks[0], prefix, max_length=len(chunks[0]), mode='truncate')
+
+        summaries = await self._map_summaries(self.responder._section_prompts(chunks))
+        prompts = self.responder._merge_prompts(summaries)
+        while prompts:
+            summaries = await self._map_summaries(prompts)
+            prompts = self.responder._merge_prompts(summaries)
+        return await self._retry_generate(self.responder._combined_summary_prompt(summaries, prefix)) or "No summary available."
+
+    async def _map_summaries(self, prompts):
+        """Run summary prompts concurrently, at most summary_max_workers at a time, in prompt order"""
+        semaphore = asyncio.Semaphore(self.responder.summary_max_workers)
+
+        async def generate(prompt):
+            async with semaphore:
+                return await self._retry_generate(prompt)
+        return list(await asyncio.gather(*(generate(prompt) for prompt in prompts)))
+
+    async def process_attachment(self, source, file_type, text=None):
+        """Summarize a document attachment, or return a spreadsheet's profile as it is"""
+        try:
+            file_type = file_type.lower()
+            if text is None:
+                text = await self.extract_attachment_text(source, file_type)
+            if file_type not in DOCUMENT_PREFIXES:
+                return text
+            return await self.summarize_text(text, DOCUMENT_PREFIXES[file_type])
+        except Exception as e:
+            return f"[Error processing {file_type} file: {str(e)}]"
+
+    @_instrumented
+    async def extract_attachment_text(self, source, file_type):
+        """Extract document text or a spreadsheet profile in the default executor"""
+        return await asyncio.to_thread(self.responder._extract_text, source, file_type)
+
+    @_instrumented
+    async def analyze_attachment(self, source, file_type, sha256=None, progress=None):
+        """Summarize an attachment and detect its sentiment, reusing stored results by content hash"""
+        progress = progress or (lambda stage, percent: None)
+        cached = None
+        if self.attachment_store is not None and sha256:
+            cached = await asyncio.to_thread(self.attachment_store.get, sha256)
+            if cached and cached['summary'] is not None:
+                self.responder._record('cache_hits_total', cache='attachment_summary')
+                return {'summary': cached['summary'], 'sentiment': cached['sentiment']}
+            self.responder._record('cache_misses_total', cache='attachment_summary')
+
+        text = cached['text'] if cached else None
+        if text is None:
+            progress('extracting', 20)
+            try:
+                text = await self.extract_attachment_text(source, file_type)
+            except Exception as e:
+                return _attachment_error(file_type, e)
+            if self.attachment_store is not None and sha256 and file_type.lower() in DOCUMENT_PREFIXES:
+                await asyncio.to_thread(self.attachment_store.save_text, sha256, text)
+
+        progress('summarizing', 50)
+        summary = await self.process_attachment(source, file_type, text=text)
+        if summary.startswith('[Error'):
+            return {'summary': summary, 'sentiment': dict(DEFAULT_SENTIMENT)}
+        progress('analyzing_sentiment', 85)
+        sentiment = await self.detect_sentiment(summary)
+        if self.attachment_store is not None and sha256:
+            await asyncio.to_thread(self.attachment_store.save_analysis, sha256, summary, sentiment)
+        return {'summary': summary, 'sentiment': sentiment}
+
+    @_instrumented
+    async def generate_reply_options(self, email_body, sender_name=None, num_options=3):
+        """Generate personalized reply options with dynamic placeholders"""
+        return self.responder._parse_reply_options(await self._retry_generate(
+            self.responder._reply_prompt(email_body, sender_name, num_options)))
+
+    @_instrumented
+    async def rank_emails_by_importance(self, email_summaries):
+        """Rank analyzed emails with one model call, falling back to inbox order"""
+        if not email_summaries:
+            return []
+
+        try:
+            return self.responder._parse_ranking(await self._retry_generate(self.responder._ranking_prompt(email_summaries)),
+                                       len(email_summaries))
+        except Exception as e:
+            print(f"Error in email ranking: {str(e)}")
+            return list(range(len(email_summaries)))
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+
+class AttachmentStore:
+    """Content-addressed store for attachment bytes and their extracted text and analysis.
+
+    Blobs are saved once per SHA-256 digest under `root`, so the same file
+    arriving in several emails or uploads is written, extracted and summarized
+    once. Small attachments are only indexed and stay in memory. The total
+    size of stored blobs is kept under `max_bytes`, and the index under
+    `max_entries`, by evicting the least recently used entries. Pinned
+    entries, such as uploads waiting for a background job, are never evicted.
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, inline_max_bytes=2 * 1024 * 1024,
+                 max_entries=10000):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.inline_max_bytes = inline_max_bytes
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS attachments ("
+                "sha256 TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+                "text TEXT, summary TEXT, sentiment TEXT, accessed REAL NOT NULL, "
+                "pins INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS attachments_accessed ON attachments (accessed)")
+
+    def _connect(self):
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def put(self, data, filename, persist=None, pin=False):
+        """Register bytes under their digest and return {'sha256', 'path', 'data', 'filename'}.
+
+        Attachments up to inline_max_bytes are not written to disk unless
+        `persist` is True; their record carries the bytes in `data` and `path`
+        is None. Larger ones are written once and handed on by `path` only, so
+        parsers can stream them instead of holding another copy. With `pin`,
+        the entry is kept from eviction until a matching `unpin`.
+        """
+        sha256 = self.digest(data)
+        # Blobs are named by digest alone; callers pass the file type from `filename`
+        path = os.path.join(self.root, 'blobs', sha256[:2], sha256)
+        in_memory = len(data) <= self.inline_max_bytes
+        if persist is None:
+            persist = not in_memory
+
+        on_disk = os.path.exists(path)
+        if persist and not on_disk:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see partial blobs
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            on_disk = True
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO attachments (sha256, path, size, accessed, pins) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET path = excluded.path, size = excluded.size, "
+                "accessed = excluded.accessed, pins = pins + excluded.pins",
+                (sha256, path if on_disk else '', len(data) if on_disk else 0, time.time(), int(pin))
+            )
+        self._evict(keep=sha256)
+        return {
+            'sha256': sha256,
+            'path': path if on_disk else None,
+            'data': data if in_memory else None,
+            'filename': filename
+        }
+
+    def get(self, sha256):
+        """Return the cached {'text', 'summary', 'sentiment'} for a digest, or None"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT text, summary, sentiment FROM attachments WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE attachments SET accessed = ? WHERE sha256 = ?", (time.time(), sha256))
+        return {
+            'text': row[0],
+            'summary': row[1],
+            'sentiment': json.loads(row[2]) if row[2] else None
+        }
+
+    def unpin(self, sha256):
+        """Release one pin taken by `put`, making the entry evictable again once none are left"""
+        with self._connect() as conn:
+            conn.execute("UPDATE attachments SET pins = MAX(pins - 1, 0) WHERE sha256 = ?", (sha256,))
+
+    def save_text(self, sha256, text):
+        with self._connect() as conn:
+            conn.execute("UPDATE attachments SET text = ? WHERE sha256 = ?", (text, sha256))
+
+    def save_analysis(self, sha256, summary, sentiment):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE attachments SET summary = ?, sentiment = ? WHERE sha256 = ?",
+                (summary, json.dumps(sentiment), sha256)
+            )
+
+    def _evict(self, keep=None):
+        """Remove least recently used entries (except `keep`) until the store fits its limits"""
+        with self._lock:
+            conn = self._connect()
+            total, count = conn.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM attachments").fetchone()
+            if total <= self.max_bytes and count <= self.max_entries:
+                return
+            rows = conn.execute(
+                "SELECT sha256, path, size FROM attachments WHERE pins = 0 ORDER BY accessed").fetchall()
+            evicted = []
+            for sha256, path, size in rows:
+                if total <= self.max_bytes and count <= self.max_entries:
+                    break
+                if sha256 == keep or (count <= self.max_entries and not size):
+                    continue
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                evicted.append((sha256,))
+                total -= size
+                count -= 1
+            with conn:
+                conn.executemany("DELETE FROM attachments WHERE sha256 = ?", evicted)
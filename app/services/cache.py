@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class LLMCache:
+    """Content-addressed cache for LLM responses.
+
+    Entries live in an in-memory LRU tier and, when `disk_path` is set, in a
+    SQLite database that survives restarts and is shared by every worker
+    process pointing at the same file.
+    """
+
+    def __init__(self, max_entries=1024, ttl=86400, disk_path=None, max_disk_entries=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+
+    @staticmethod
+    def make_key(model_name, prompt):
+        """Hash the model name and prompt into a cache key"""
+        digest = hashlib.sha256()
+        digest.update(str(model_name).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(prompt.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._remember(key, value[0], value[1])
+        return value[0]
+
+    def set(self, key, value):
+        """Store a response in every tier"""
+        now = time.time()
+        self._remember(key, value, now)
+        self._disk_set(key, value, now)
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory)
+            }
+
+    def _expired(self, created, now):
+        return bool(self.ttl) and now - created > self.ttl
+
+    def _remember(self, key, value, created):
+        """Insert into the memory tier, evicting the least recently used entries"""
+        with self._lock:
+            self._memory[key] = (value, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _connect(self):
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key, now):
+        if not self.disk_path:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1], now):
+                with conn:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            with conn:
+                conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            return row
+        except sqlite3.Error as e:
+            print(f"LLM cache read failed: {str(e)}")
+            return None
+
+    def _disk_set(self, key, value, now):
+        if not self.disk_path:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 100 == 0
+            if prune:
+                self._prune(conn, now)
+        except sqlite3.Error as e:
+            print(f"LLM cache write failed: {str(e)}")
+
+    def _prune(self, conn, now):
+        """Drop expired entries and trim the disk tier to its size limit"""
+        with conn:
+            if self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            )
@@ -1,71 +1,248 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import contextlib
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import docx
 import csv
 import pandas as pd
 
+# File-like inputs larger than this are spooled to a temporary file instead of held in memory
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+
+# PDFs with more pages than this are extracted in parallel after an in-process first pass
+PDF_PARALLEL_MIN_PAGES = 24
+PDF_PAGES_PER_TASK = 16
+
+
+@contextlib.contextmanager
+def open_binary(source, spool_threshold=SPOOL_THRESHOLD):
+    """Yield a seekable binary stream for a path, bytes-like object or file object.
+
+    Bytes-like inputs are wrapped without touching disk. Non-seekable file
+    objects are copied into a SpooledTemporaryFile, which stays in memory up
+    to spool_threshold bytes.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif hasattr(source, 'seekable') and source.seekable():
+        source.seek(0)
+        yield source
+    else:
+        with tempfile.SpooledTemporaryFile(max_size=spool_threshold) as spooled:
+            shutil.copyfileobj(source, spooled)
+            spooled.seek(0)
+            yield spooled
+
+
+def as_buffer(source):
+    """Return bytes or bytearray for a bytes-like or file source, copying only when needed"""
+    if isinstance(source, (bytes, bytearray)):
+        return source
+    if isinstance(source, memoryview):
+        return source.obj if isinstance(source.obj, bytes) and source.nbytes == len(source.obj) else source.tobytes()
+    with open_binary(source) as f:
+        return f.read()
+
+
+def _extract_pdf_pages(path, start, stop):
+    """Extract pages [start, stop) of a PDF file; runs in a worker process"""
+    with fitz.open(path) as doc:
+        return [doc[number].get_text() for number in range(start, stop)]
+
+
+@contextlib.contextmanager
+def _pdf_path(source):
+    """Yield a path for a PDF given as a path or buffer, writing a buffer to a temporary file once.
+
+    Worker tasks then receive only the path, not a pickled copy of the whole
+    document each.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(source)
+        yield path
+    finally:
+        # A range still running after an early stop may fail to reopen it; its result is discarded anyway
+        os.remove(path)
+
+
 class FileProcessor:
-    def __init__(self):
-        pass
-
-    def extract_text(self, file_path):
-        """Extract text from various file formats"""
-        if file_path.endswith(".pdf"):
-            return self._extract_text_from_pdf(file_path)
-        elif file_path.endswith(".docx"):
-            return self._extract_text_from_docx(file_path)
-        elif file_path.endswith(".txt"):
-            return self._extract_text_from_txt(file_path)
-        elif file_path.endswith(".csv"):
-            return self._extract_text_from_csv(file_path)
-        elif file_path.endswith(".xlsx"):
-            return self._extract_text_from_xlsx(file_path)
+    """Single text extraction engine for documents, uploads and attachments.
+
+    Large PDFs are read page by page: the first PDF_PARALLEL_MIN_PAGES pages
+    in-process, the rest in page ranges across a process pool. Extraction
+    stops at `max_pages`, and once `max_chars` of text (the summarization
+    budget) has been collected the remaining ranges are cancelled. CSV text
+    is a preview of the first `csv_preview_rows` rows.
+    """
+
+    def __init__(self, spool_threshold=SPOOL_THRESHOLD, max_pages=500, max_workers=None,
+                 csv_preview_rows=1000):
+        self.spool_threshold = spool_threshold
+        self.csv_preview_rows = csv_preview_rows
+        self.max_pages = max_pages
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        """Start the PDF worker pool on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawned workers do not inherit the locks of the threads running in this process
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def extract_text(self, source, file_type=None, max_chars=None):
+        """Extract text from a file path, bytes-like object or binary file object.
+
+        The file type is taken from the path extension unless given explicitly,
+        which is required for in-memory sources. `max_chars` lets PDF
+        extraction stop early once that much text has been read.
+        """
+        if file_type is None:
+            if not isinstance(source, str):
+                return "[Unsupported file type: unknown]"
+            file_type = source.rsplit('.', 1)[-1]
+        file_type = file_type.lower().lstrip('.')
+
+        if file_type == "pdf":
+            return self._extract_text_from_pdf(source, max_chars)
+        elif file_type in ("docx", "doc"):
+            return self._extract_text_from_docx(source)
+        elif file_type == "txt":
+            return self._extract_text_from_txt(source)
+        elif file_type == "csv":
+            return self._extract_text_from_csv(source, max_chars)
+        elif file_type in ("xlsx", "xls"):
+            return self._extract_text_from_xlsx(source)
         else:
-            return f"[Unsupported file type: {file_path}]"
+            return f"[Unsupported file type: {file_type}]"
 
-    def _extract_text_from_pdf(self, file_path):
+    def _extract_text_from_pdf(self, source, max_chars=None):
         """Extract text from PDF using PyMuPDF"""
         try:
-            doc = fitz.open(file_path)
-            return "\n".join([page.get_text() for page in doc])
+            if isinstance(source, str):
+                doc = fitz.open(source)
+            else:
+                # Materialize once; it is written to disk only if workers are needed
+                source = as_buffer(source)
+                doc = fitz.open(stream=source, filetype="pdf")
+
+            pages = []
+            collected = 0
+            with doc:
+                page_count = min(doc.page_count, self.max_pages)
+                for number in range(min(page_count, PDF_PARALLEL_MIN_PAGES)):
+                    text = doc[number].get_text()
+                    pages.append(text)
+                    collected += len(text)
+                    if max_chars and collected >= max_chars:
+                        return "\n".join(pages)
+
+            if page_count > PDF_PARALLEL_MIN_PAGES:
+                with _pdf_path(source) as path:
+                    pages.extend(self._extract_pdf_pages_parallel(
+                        path, PDF_PARALLEL_MIN_PAGES, page_count, max_chars and max_chars - collected))
+            return "\n".join(pages)
         except Exception as e:
             return f"[Error reading PDF: {e}]"
 
-    def _extract_text_from_docx(self, file_path):
+    def _extract_pdf_pages_parallel(self, path, start, stop, max_chars=None):
+        """Extract pages [start, stop) in ranges across the process pool, in page order.
+
+        Only max_workers ranges are in flight at a time, so little work is
+        wasted when the text budget is filled part way through the document.
+        """
+        pool = self._get_pool()
+        ranges = collections.deque(
+            (first, min(first + PDF_PAGES_PER_TASK, stop)) for first in range(start, stop, PDF_PAGES_PER_TASK))
+        pending = collections.deque()
+        pages = []
+        collected = 0
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < self.max_workers:
+                    pending.append(pool.submit(_extract_pdf_pages, path, *ranges.popleft()))
+                for text in pending.popleft().result():
+                    pages.append(text)
+                    collected += len(text)
+                if max_chars and collected >= max_chars:
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+        return pages
+
+    def _extract_text_from_docx(self, source):
         """Extract text from Word documents"""
         try:
-            doc = docx.Document(file_path)
+            with open_binary(source, self.spool_threshold) as f:
+                doc = docx.Document(f)
             return "\n".join([para.text for para in doc.paragraphs])
         except Exception as e:
             return f"[Error reading DOCX: {e}]"
 
-    def _extract_text_from_txt(self, file_path):
+    def _extract_text_from_txt(self, source):
         """Extract text from plain text files"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read()
+            with open_binary(source, self.spool_threshold) as f:
+                return f.read().decode('utf-8', errors='ignore')
         except Exception as e:
             return f"[Error reading TXT: {e}]"
 
-    def _extract_text_from_csv(self, file_path):
-        """Extract text from CSV files"""
+    def _extract_text_from_csv(self, source, max_chars=None):
+        """Extract text from CSV files, streaming rows and stopping at csv_preview_rows or max_chars"""
         try:
             lines = []
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    lines.append(", ".join(row))
+            collected = 0
+            skipped = 0
+            with open_binary(source, self.spool_threshold) as f:
+                text = io.TextIOWrapper(f, encoding='utf-8', errors='ignore', newline='')
+                try:
+                    reader = csv.reader(text)
+                    for row in reader:
+                        if skipped or len(lines) >= self.csv_preview_rows or (max_chars and collected >= max_chars):
+                            # Count the rest without keeping it
+                            skipped += 1
+                            continue
+                        line = ", ".join(row)
+                        lines.append(line)
+                        collected += len(line) + 1
+                finally:
+                    # Leave the caller's stream open
+                    text.detach()
+            if skipped:
+                lines.append(f"[... {skipped} more rows]")
             return "\n".join(lines)
         except Exception as e:
             return f"[Error reading CSV: {e}]"
 
-    def _extract_text_from_xlsx(self, file_path):
+    def _extract_text_from_xlsx(self, source):
         """Extract text from Excel files"""
         try:
-            df = pd.read_excel(file_path, sheet_name=None)
+            with open_binary(source, self.spool_threshold) as f:
+                df = pd.read_excel(f, sheet_name=None)
             content = []
             for sheet, data in df.items():
                 content.append(f"Sheet: {sheet}")
                 content.append(data.to_string(index=False))
             return "\n\n".join(content)
         except Exception as e:
-            return f"[Error reading XLSX: {e}]" 
\ No newline at end of file
+            return f"[Error reading XLSX: {e}]"
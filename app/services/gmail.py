@@ -1,21 +1,204 @@
 import os
+import time
+import random
 import pickle
 import base64
+import json
+import hashlib
+import tempfile
+import threading
+import httplib2
+import google_auth_httplib2
 from email.mime.text import MIMEText
+from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from google.api_core.exceptions import TooManyRequests
 
+# Gmail accepts up to 100 calls per batch but recommends 50 to avoid rate limiting
+BATCH_SIZE = 50
+BATCH_MAX_ATTEMPTS = 3
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Largest page messages.list serves
+MAX_LIST_RESULTS = 500
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+
+def _is_retryable(exception):
+    """Whether a per-item batch error is worth retrying"""
+    resp = getattr(exception, 'resp', None)
+    return resp is not None and getattr(resp, 'status', None) in RETRYABLE_STATUSES
+
+
+def gmail_discovery_document():
+    """Parse the Gmail discovery document bundled with googleapiclient, once per process"""
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            document = get_static_doc('gmail', 'v1')
+            if document is None:
+                raise Exception("Gmail discovery document is not bundled with googleapiclient")
+            _discovery_document = json.loads(document)
+        return _discovery_document
+
+
+class ParsedMessage:
+    """A full Gmail message parsed once: headers, body text and attachment descriptors"""
+
+    def __init__(self, msg_data):
+        self.raw = msg_data
+        self.id = msg_data['id']
+        self.thread_id = msg_data.get('threadId')
+        self.history_id = msg_data.get('historyId')
+        self.label_ids = msg_data.get('labelIds', [])
+        self.internal_date = int(msg_data.get('internalDate', 0))
+
+        payload = msg_data.get('payload', {})
+        headers = payload.get('headers', [])
+        self.subject = _header(headers, 'Subject', 'No Subject')
+        self.sender = _header(headers, 'From', 'Unknown Sender')
+        self.date = _header(headers, 'Date', '')
+
+        self.attachments = []
+        self._text_parts = {}
+        self._walk(payload)
+        self.body = self._decode_body()
+
+    def _walk(self, part):
+        """Recursively collect text parts and attachments from the MIME tree"""
+        body = part.get('body', {})
+        if part.get('filename'):
+            if 'attachmentId' in body or 'data' in body:
+                self.attachments.append({
+                    'filename': part['filename'],
+                    'mime_type': part.get('mimeType', ''),
+                    'size': body.get('size', 0),
+                    'attachment_id': body.get('attachmentId'),
+                    'data': body.get('data')
+                })
+        elif 'data' in body:
+            # Keep the first part of each type; text/plain wins over any other type
+            self._text_parts.setdefault(part.get('mimeType', ''), body['data'])
+
+        for child in part.get('parts', []):
+            self._walk(child)
+
+    def _decode_body(self):
+        """Decode the preferred body part: text/plain, then text/html, then anything"""
+        data = (self._text_parts.get('text/plain') or self._text_parts.get('text/html')
+                or next(iter(self._text_parts.values()), ''))
+        try:
+            return base64.urlsafe_b64decode(data.encode('UTF-8')).decode('utf-8', errors='ignore').strip()
+        except Exception:
+            return "[Error decoding body]"
+
+    def to_dict(self):
+        """Return the email fields used by the routes"""
+        return {
+            'id': self.id,
+            'subject': self.subject,
+            'from': self.sender,
+            'body': self.body,
+            'received': self.internal_date / 1000 if self.internal_date else None
+        }
+
+
+def _header(headers, name, default):
+    return next((h['value'] for h in headers if h['name'] == name), default)
+
+
 class GmailClient:
-    def __init__(self, creds_path, token_path, save_dir="uploads"):
+    """Gmail API client that is safe to share between threads.
+
+    httplib2 transports are not thread-safe, so every thread gets its own
+    service object on top of its own keep-alive connection. All of them
+    authorize with one shared credential, which is refreshed in place under
+    a lock.
+    """
+
+    def __init__(self, creds_path, token_path, save_dir="uploads", attachment_store=None,
+                 inline_max_bytes=2 * 1024 * 1024, http_timeout=60, metrics=None):
         self.creds_path = creds_path
         self.token_path = token_path
         self.save_dir = save_dir
-        self.service = None
+        self.attachment_store = attachment_store
+        self.inline_max_bytes = inline_max_bytes
+        self.http_timeout = http_timeout
+        self.metrics = metrics
+        self.credentials = None
+        # Bumped whenever the credentials are replaced so threads rebuild their service
+        self._generation = 0
+        self._local = threading.local()
+        self._credentials_lock = threading.Lock()
         os.makedirs(save_dir, exist_ok=True)
 
+    @property
+    def service(self):
+        """This thread's Gmail service object, or None until credentials are set"""
+        if self.credentials is None:
+            return None
+        self._refresh_credentials()
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            local.service = self._build_service()
+            local.generation = self._generation
+        return local.service
+
+    def _build_service(self):
+        """Build a service object on a new keep-alive transport sharing the credentials.
+
+        The service comes from the pre-parsed bundled discovery document, so
+        this costs microseconds and never fetches discovery over the network.
+        """
+        http = google_auth_httplib2.AuthorizedHttp(
+            self.credentials, http=httplib2.Http(timeout=self.http_timeout))
+        return build_from_document(gmail_discovery_document(), http=http)
+
+    def _refresh_credentials(self):
+        """Refresh the shared credentials once when they expire, however many threads notice"""
+        credentials = self.credentials
+        if credentials.valid or not getattr(credentials, 'refresh_token', None):
+            return
+        with self._credentials_lock:
+            if not credentials.valid:
+                credentials.refresh(Request())
+                self._save_credentials(credentials)
+
+    def set_credentials(self, credentials, persist=False):
+        """Use new credentials for every thread's service, optionally saving them as the token"""
+        with self._credentials_lock:
+            self.credentials = credentials
+            self._generation += 1
+            if persist:
+                self._save_credentials(credentials)
+
+    def _save_credentials(self, credentials):
+        """Write the token file atomically so other workers never read a partial pickle"""
+        try:
+            directory = os.path.dirname(self.token_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            try:
+                with os.fdopen(fd, 'wb') as token:
+                    pickle.dump(credentials, token)
+                os.replace(tmp_path, self.token_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print(f"Could not save Gmail token: {str(e)}")
+
     def authenticate(self):
-        """Authenticate with Gmail API using OAuth 2.0"""
+        """Authenticate with Gmail API using OAuth 2.0.
+
+        The token file is read only the first time; afterwards the credentials
+        are kept in memory and refreshed in place.
+        """
+        if self.credentials is not None:
+            return self.service
         if os.path.exists(self.token_path):
             with open(self.token_path, 'rb') as token:
                 creds = pickle.load(token)
@@ -31,86 +214,196 @@ class GmailClient:
                 "After authorizing, call authenticate() again with the code."
             )
 
-        self.service = build('gmail', 'v1', credentials=creds)
+        self.set_credentials(creds)
         return self.service
 
-    def get_unread_emails(self, max_results=10):
+    def _execute(self, request, method):
+        """Execute an API request or batch, recording its count, status and latency"""
+        if self.metrics is None:
+            return request.execute()
+        self.metrics.inc('gmail_api_in_flight')
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = request.execute()
+            status = 'ok'
+            return response
+        finally:
+            self.metrics.dec('gmail_api_in_flight')
+            self.metrics.inc('gmail_api_calls_total', method=method, status=status)
+            self.metrics.observe('gmail_api_duration_seconds', time.perf_counter() - start, method=method)
+
+    def get_unread_emails(self, max_results=10, page_token=None):
         """Get unread emails from inbox"""
+        messages, _ = self.get_unread_page(max_results, page_token)
+        return [message.to_dict() for message in messages]
+
+    def get_unread_messages(self, max_results=10):
+        """Get unread inbox messages as ParsedMessage objects"""
+        return self.get_messages(self.list_unread_ids(max_results))
+
+    def get_unread_page(self, max_results=10, page_token=None):
+        """Return (one page of unread inbox messages as ParsedMessage objects, next page token)"""
+        msg_ids, next_page_token = self.list_unread_page(max_results, page_token)
+        return self.get_messages(msg_ids), next_page_token
+
+    def list_unread_ids(self, max_results=10):
+        """List the ids of unread inbox messages, newest first"""
+        return self.list_unread_page(max_results)[0]
+
+    def list_unread_page(self, max_results=10, page_token=None):
+        """Return (ids of one page of unread inbox messages, newest first, next page token or None)"""
         if not self.service:
             self.authenticate()
 
-        response = self.service.users().messages().list(
-            userId='me', labelIds=['INBOX'], q='is:unread').execute()
-        messages = response.get('messages', [])[:max_results]
+        response = self._execute(self.service.users().messages().list(
+            userId='me',
+            labelIds=['INBOX'],
+            q='is:unread',
+            maxResults=min(max_results, MAX_LIST_RESULTS),
+            pageToken=page_token
+        ), 'messages.list')
+        msg_ids = [msg['id'] for msg in response.get('messages', [])]
+        return msg_ids, response.get('nextPageToken')
 
-        emails = []
-        for msg in messages:
-            try:
-                msg_data = self.service.users().messages().get(
-                    userId='me', id=msg['id'], format='full').execute()
-                payload = msg_data.get('payload', {})
-                headers = payload.get('headers', [])
-
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender')
-
-                # More robust body extraction
-                body = ""
-                if 'body' in payload and 'data' in payload['body']:
-                    # Direct body data
-                    body = payload['body']['data']
-                elif 'parts' in payload:
-                    # Try to find the first text/plain part
-                    for part in payload['parts']:
-                        if part.get('mimeType') == 'text/plain' and 'data' in part.get('body', {}):
-                            body = part['body']['data']
-                            break
-                        # If no text/plain part found, try any part with data
-                        elif 'data' in part.get('body', {}):
-                            body = part['body']['data']
-                            break
+    def get_messages(self, msg_ids):
+        """Fetch specific messages as ParsedMessage objects, skipping ones that fail"""
+        if not self.service:
+            self.authenticate()
 
+        fetched = self._batch_get_messages(msg_ids)
+        parsed = []
+        for msg_id in msg_ids:
+            if msg_id in fetched:
                 try:
-                    decoded_body = base64.urlsafe_b64decode(body.encode('UTF-8')).decode('utf-8', errors='ignore')
-                except Exception:
-                    decoded_body = "[Error decoding body]"
-
-                emails.append({
-                    'id': msg['id'],
-                    'subject': subject,
-                    'from': sender,
-                    'body': decoded_body.strip()
-                })
-            except Exception as e:
-                # Log the error but continue processing other emails
-                print(f"Error processing email {msg.get('id')}: {str(e)}")
-                continue
+                    parsed.append(ParsedMessage(fetched[msg_id]))
+                except Exception as e:
+                    print(f"Error processing email {msg_id}: {str(e)}")
+        return parsed
 
-        return emails
+    def get_history_id(self):
+        """Return the mailbox's current history id"""
+        if not self.service:
+            self.authenticate()
+
+        return self._execute(self.service.users().getProfile(userId='me'), 'getProfile')['historyId']
+
+    def list_history(self, start_history_id):
+        """Return (history records, latest history id) for inbox changes since start_history_id.
 
-    def get_attachments(self, msg_id):
-        """Download attachments from a message"""
+        Raises googleapiclient.errors.HttpError with status 404 when
+        start_history_id is too old for Gmail to serve.
+        """
         if not self.service:
             self.authenticate()
 
-        attachments_info = []
-        msg = self.service.users().messages().get(userId='me', id=msg_id).execute()
-        parts = msg.get('payload', {}).get('parts', [])
+        records = []
+        page_token = None
+        latest = start_history_id
+        while True:
+            response = self._execute(self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                labelId='INBOX',
+                historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+                pageToken=page_token
+            ), 'history.list')
+            records.extend(response.get('history', []))
+            latest = response.get('historyId', latest)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return records, latest
+
+    def _batch_get_messages(self, msg_ids, msg_format='full'):
+        """Fetch messages through the batch endpoint, BATCH_SIZE requests per round-trip.
+
+        Items that fail with a retryable status (rate limit or server error) are
+        retried in a later batch with backoff; other failures are logged and
+        skipped. Returns a dict of message id -> message resource.
+        """
+        results = {}
+        pending = list(dict.fromkeys(msg_ids))
 
-        for part in parts:
-            if part.get('filename') and 'attachmentId' in part.get('body', {}):
-                attachment_id = part['body']['attachmentId']
-                attachment = self.service.users().messages().attachments().get(
-                    userId='me', messageId=msg_id, id=attachment_id).execute()
-                file_data = base64.urlsafe_b64decode(attachment['data'].encode('UTF-8'))
-                file_path = os.path.join(self.save_dir, part['filename'])
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            retry = []
 
-                with open(file_path, 'wb') as f:
-                    f.write(file_data)
-                attachments_info.append(file_path)
+            def callback(request_id, response, exception):
+                if exception is None:
+                    results[request_id] = response
+                elif _is_retryable(exception):
+                    retry.append(request_id)
+                else:
+                    print(f"Error fetching email {request_id}: {str(exception)}")
+
+            for start in range(0, len(pending), BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=callback)
+                for msg_id in pending[start:start + BATCH_SIZE]:
+                    batch.add(
+                        self.service.users().messages().get(userId='me', id=msg_id, format=msg_format),
+                        request_id=msg_id
+                    )
+                self._execute(batch, 'messages.batchGet')
+
+            if not retry:
+                break
+            pending = retry
+            if attempt + 1 < BATCH_MAX_ATTEMPTS:
+                time.sleep(2 ** attempt + random.uniform(0, 1))
+        else:
+            for msg_id in pending:
+                print(f"Error fetching email {msg_id}: retries exhausted")
+
+        return results
+
+    def get_attachments(self, message):
+        """Download attachments from a message.
+
+        Accepts a ParsedMessage from an earlier fetch, in which case the message
+        is not requested again, or a message id. Returns a list of
+        {'sha256', 'path', 'data', 'filename'} dicts where small attachments
+        carry their bytes in `data` and large ones a file `path`; with an
+        attachment store the bytes are deduplicated by content hash.
+        """
+        if not self.service:
+            self.authenticate()
+
+        if not isinstance(message, ParsedMessage):
+            message = ParsedMessage(self._execute(self.service.users().messages().get(
+                userId='me', id=message, format='full'), 'messages.get'))
+
+        attachments_info = []
+        for attachment in message.attachments:
+            if attachment['data'] is not None:
+                data = attachment['data']
+            else:
+                data = self._execute(self.service.users().messages().attachments().get(
+                    userId='me', messageId=message.id, id=attachment['attachment_id']),
+                    'messages.attachments.get')['data']
+            attachments_info.append(self._store_attachment(data, attachment['filename']))
 
         return attachments_info
 
+    def _store_attachment(self, data, filename):
+        """Decode base64url attachment data into a {'sha256', 'path', 'data', 'filename'} record"""
+        file_data = base64.urlsafe_b64decode(data.encode('UTF-8'))
+        filename = os.path.basename(filename)
+
+        if self.attachment_store is not None:
+            return self.attachment_store.put(file_data, filename)
+
+        # Small attachments stay in memory; large ones are written once and parsed from disk
+        file_path = None
+        if len(file_data) > self.inline_max_bytes:
+            file_path = os.path.join(self.save_dir, filename)
+            with open(file_path, 'wb') as f:
+                f.write(file_data)
+        return {
+            'sha256': hashlib.sha256(file_data).hexdigest(),
+            'path': file_path,
+            'data': None if file_path else file_data,
+            'filename': filename
+        }
+
     def create_message(self, to, subject, message_text):
         """Create base64-encoded MIME message"""
         message = MIMEText(message_text)
@@ -125,13 +418,13 @@ class GmailClient:
             self.authenticate()
 
         message = self.create_message(to, subject, body)
-        return self.service.users().messages().send(userId='me', body=message).execute()
+        return self._execute(self.service.users().messages().send(userId='me', body=message), 'messages.send')
 
     def mark_as_read(self, msg_id):
         """Mark an email as read"""
         if not self.service:
             self.authenticate()
 
-        self.service.users().messages().modify(
+        self._execute(self.service.users().messages().modify(
             userId='me', id=msg_id, body={'removeLabelIds': ['UNREAD']}
-        ).execute() 
\ No newline at end of file
+        ), 'messages.modify')
\ No newline at end of file
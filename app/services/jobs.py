@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Jobs marked running whose heartbeat is older than this are assumed orphaned by a dead worker
+STALE_AFTER = 120
+
+
+class JobQueue:
+    """Background job queue persisted in SQLite and run on a bounded thread pool.
+
+    `handler(payload, progress)` does the work and returns a JSON-serializable
+    result; it may call `progress(stage, percent)` to report where it is. Jobs
+    are claimed with a conditional update, so when several gunicorn workers
+    share the database each job runs once, and jobs left queued or running by
+    a worker that died are picked up again by the next queue that starts.
+    """
+
+    def __init__(self, path, handler, max_workers=2):
+        self.path = path
+        self.handler = handler
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._heartbeat_stop = threading.Event()
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, progress INTEGER NOT NULL, "
+                "payload TEXT NOT NULL, result TEXT, error TEXT, owner TEXT, "
+                "created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated)")
+
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+        self.recover()
+
+    def _connect(self):
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, payload):
+        """Persist a new job and schedule it; returns the job id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, stage, progress, payload, created, updated) "
+                "VALUES (?, 'queued', 'queued', 0, ?, ?, ?)",
+                (job_id, json.dumps(payload), now, now)
+            )
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Return a job's public state, or None if it does not exist"""
+        row = self._connect().execute(
+            "SELECT id, status, stage, progress, result, error, created, updated FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'status': row[1],
+            'stage': row[2],
+            'progress': row[3],
+            'result': json.loads(row[4]) if row[4] else None,
+            'error': row[5],
+            'created': row[6],
+            'updated': row[7]
+        }
+
+    def stats(self):
+        """Return the number of jobs this queue is running"""
+        with self._running_lock:
+            return {'running': len(self._running)}
+
+    def recover(self):
+        """Reschedule jobs that are queued or whose worker stopped heart-beating"""
+        rows = self._connect().execute(
+            "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated < ?)",
+            (time.time() - STALE_AFTER,)
+        ).fetchall()
+        for (job_id,) in rows:
+            self._executor.submit(self._run, job_id)
+        return len(rows)
+
+    def _claim(self, job_id):
+        """Atomically mark a job as running by this queue; False if someone else has it"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated = ? WHERE id = ? AND "
+                "(status = 'queued' OR (status = 'running' AND updated < ?))",
+                (self.owner, now, job_id, now - STALE_AFTER)
+            )
+            return cursor.rowcount == 1
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            row = self._connect().execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            result = self.handler(json.loads(row[0]), lambda stage, percent: self._progress(job_id, stage, percent))
+            self._finish(job_id, 'done', result=json.dumps(result))
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            self._finish(job_id, 'failed', error=str(e))
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def _progress(self, job_id, stage, percent):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated = ? WHERE id = ? AND owner = ?",
+                (stage, percent, time.time(), job_id, self.owner)
+            )
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = ?, result = ?, error = ?, updated = ? "
+                "WHERE id = ? AND owner = ?",
+                (status, status, 100, result, error, time.time(), job_id, self.owner)
+            )
+
+    def _heartbeat(self):
+        """Keep running jobs fresh so other workers do not treat them as orphaned"""
+        while not self._heartbeat_stop.wait(STALE_AFTER / 4):
+            with self._running_lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "UPDATE jobs SET updated = ? WHERE id = ? AND owner = ?",
+                        [(time.time(), job_id, self.owner) for job_id in running]
+                    )
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {str(e)}")
@@ -1,11 +1,127 @@
 import time
 import random
+import json
+import re
+import zlib
+import functools
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from google.api_core.exceptions import TooManyRequests
+from app.services.ratelimit import estimate_tokens
+from app.services.file_processor import FileProcessor
+from app.services.profiler import TabularProfiler
+
+DEFAULT_PRIORITY = {
+    'urgency_score': 1,
+    'importance_score': 1,
+    'reason': 'Unable to analyze priority',
+    'suggested_response_time': 'this_week'
+}
+
+DEFAULT_SENTIMENT = {
+    'primary_emotion': 'Neutral',
+    'secondary_emotions': [],
+    'intensity': 1,
+    'triggers': [],
+    'emoji': '😐'
+}
+
+RESPONSE_TIMES = ('immediate', 'within_hour', 'within_day', 'this_week')
+
+# Document types that are summarized by the LLM, with their summary prompt prefix
+DOCUMENT_PREFIXES = {
+    'pdf': "Summarize this PDF document:",
+    'docx': "Summarize this Word document:",
+    'doc': "Summarize this Word document:",
+    'txt': "Summarize this text document:"
+}
+
+# Extractors return text starting with one of these instead of raising
+EXTRACTION_ERROR_PREFIXES = ('[Error ', '[Unsupported file type')
+
+# Structural boundaries for chunking, strongest first: blank lines/page breaks, line breaks, sentences
+CHUNK_SEPARATORS = (re.compile(r'\n\s*\n|\f'), re.compile(r'\n'), re.compile(r'(?<=[.!?])\s+'))
+
+SUMMARY_FORMAT = (
+    "Provide a comprehensive summary including:\n"
+    "1. Main points (bullet points)\n"
+    "2. Key action items (if any)\n"
+    "3. Important dates/deadlines (if any)\n"
+    "4. Required responses/actions (if any)\n"
+    "5. Context or background information\n\n"
+    "Format the response with clear sections and bullet points."
+)
+
+# Expected shape of the fused analysis response: field -> (type, required)
+ANALYSIS_SCHEMA = {
+    'priority_analysis': {
+        'urgency_score': (int, True),
+        'importance_score': (int, True),
+        'reason': (str, True),
+        'suggested_response_time': (str, True)
+    },
+    'sentiment': {
+        'primary_emotion': (str, True),
+        'secondary_emotions': (list, False),
+        'intensity': (int, False),
+        'triggers': (list, False),
+        'emoji': (str, False)
+    },
+    'summary': (str, True)
+}
+
+# Public LLMResponder method currently running, used to label model-call metrics
+_current_method = contextvars.ContextVar('llm_method', default='other')
+
+
+def _instrumented(method):
+    """Record call count, status and latency of an LLMResponder method when metrics are enabled"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        with _method_metrics(self.metrics, name):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def _method_metrics(metrics, name):
+    """Label model calls made inside the block with the method name and record its status and latency"""
+    token = _current_method.set(name)
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        _current_method.reset(token)
+        metrics.inc('llm_method_calls_total', method=name, status=status)
+        metrics.observe('llm_method_duration_seconds', time.perf_counter() - start, method=name)
+
 
 class LLMResponder:
-    def __init__(self, model, signature="Best,\nJainil Desai"):
+    def __init__(self, model, signature="Best,\nJainil Desai", cache=None, attachment_store=None,
+                 rate_limiter=None, file_processor=None, summary_max_chars=3000,
+                 summary_mode='map_reduce', summary_chunk_chars=12000, summary_token_budget=60000,
+                 summary_max_workers=4, profiler=None, metrics=None):
         self.model = model
         self.signature = signature
+        self.cache = cache
+        self.attachment_store = attachment_store
+        self.rate_limiter = rate_limiter
+        self.file_processor = file_processor or FileProcessor()
+        self.summary_max_chars = summary_max_chars
+        self.summary_mode = summary_mode
+        self.summary_chunk_chars = summary_chunk_chars
+        self.summary_token_budget = summary_token_budget
+        self.summary_max_workers = summary_max_workers
+        self.profiler = profiler or TabularProfiler()
+        self.metrics = metrics
+        self.model_name = getattr(model, 'model_name', type(model).__name__)
         self.urgency_keywords = {
             'urgent': 5, 'asap': 5, 'immediately': 5, 'deadline': 4,
             'important': 4, 'critical': 4, 'emergency': 5, 'priority': 4,
@@ -13,18 +129,86 @@ class LLMResponder:
         }
 
     def _retry_generate(self, prompt, max_attempts=3):
-        """Retry mechanism for rate-limited LLM requests"""
+        """Retry mechanism for rate-limited LLM requests, served from the cache when possible"""
+        method = _current_method.get()
+        cache_key, cached = self._cache_lookup(prompt, method)
+        if cached is not None:
+            return cached
+
         for attempt in range(max_attempts):
+            if attempt:
+                self._record('llm_retries_total', method=method)
             try:
-                return self.model.generate_content(prompt).text.strip()
+                with self._rate_limit(prompt), self._generate_timer():
+                    text = self.model.generate_content(prompt).text.strip()
+                return self._generated(text, cache_key, method)
             except TooManyRequests:
-                wait = 2 ** attempt + random.uniform(0, 1)
-                time.sleep(wait)
+                self._record('llm_generate_total', method=method, outcome='throttled')
+                # The shared limiter already backs off every caller after a 429
+                if self.rate_limiter is None:
+                    wait = 2 ** attempt + random.uniform(0, 1)
+                    time.sleep(wait)
+            except Exception:
+                self._record('llm_generate_total', method=method, outcome='error')
+                raise
         raise Exception("Rate limit exceeded")
 
+    def _cache_lookup(self, prompt, method):
+        """Return (cache key, cached response or None), recording the prompt size on a miss"""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_name, prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._record('llm_generate_total', method=method, outcome='cache_hit')
+                return cache_key, cached
+        if self.metrics is not None:
+            self.metrics.observe('llm_prompt_chars', len(prompt), method=method)
+        return cache_key, None
+
+    def _generated(self, text, cache_key, method):
+        """Record a successful model response and cache it"""
+        self._record('llm_generate_total', method=method, outcome='success')
+        if self.metrics is not None:
+            self.metrics.observe('llm_response_chars', len(text), method=method)
+        if cache_key is not None and text:
+            self.cache.set(cache_key, text)
+        return text
+
+    def _record(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+    @contextlib.contextmanager
+    def _generate_timer(self):
+        """Track in-flight model calls and their latency"""
+        if self.metrics is None:
+            yield
+            return
+        self.metrics.inc('llm_requests_in_flight')
+        try:
+            with self.metrics.timer('llm_generate_duration_seconds'):
+                yield
+        finally:
+            self.metrics.dec('llm_requests_in_flight')
+
+    def _rate_limit(self, prompt):
+        """Reserve rate limiter budget for a prompt, if a limiter is configured"""
+        if self.rate_limiter is None:
+            return contextlib.nullcontext()
+        return self.rate_limiter.limit(estimate_tokens(prompt))
+
+    @_instrumented
     def analyze_email_priority(self, email_subject, email_body, sender):
         """Analyze email priority based on content and sender"""
-        prompt = (
+        try:
+            return self._parse_priority(self._retry_generate(
+                self._priority_prompt(email_subject, email_body, sender)))
+        except Exception as e:
+            return dict(DEFAULT_PRIORITY, reason=f'Error in priority analysis: {str(e)}')
+
+    def _priority_prompt(self, email_subject, email_body, sender):
+        return (
             "Analyze this email for urgency and importance. Consider:\n"
             "1. Subject line urgency indicators\n"
             "2. Content urgency indicators\n"
@@ -40,32 +224,129 @@ class LLMResponder:
             "- reason (brief explanation)\n"
             "- suggested_response_time (immediate/within_hour/within_day/this_week)"
         )
-        
+
+    def _parse_priority(self, response):
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        return dict(DEFAULT_PRIORITY)
+
+    @_instrumented
+    def analyze_email(self, email_subject, email_body, sender):
+        """Analyze priority, sentiment and summary of an email in a single request.
+
+        Only a malformed response falls back to separate requests; model
+        errors and rate-limit exhaustion are raised, since three more calls
+        would only add load to a failing or throttled backend.
+        """
+        response = self._retry_generate(self._analysis_prompt(email_subject, email_body, sender))
         try:
-            response = self._retry_generate(prompt)
-            # Extract JSON from response
-            import json
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            return {
-                'urgency_score': 1,
-                'importance_score': 1,
-                'reason': 'Unable to analyze priority',
-                'suggested_response_time': 'this_week'
-            }
-        except Exception as e:
+            return self._validate_analysis(self._extract_json(response))
+        except ValueError as e:
+            print(f"Fused analysis failed, falling back to separate requests: {str(e)}")
             return {
-                'urgency_score': 1,
-                'importance_score': 1,
-                'reason': f'Error in priority analysis: {str(e)}',
-                'suggested_response_time': 'this_week'
+                'priority_analysis': self.analyze_email_priority(email_subject, email_body, sender),
+                'sentiment': self.detect_sentiment(email_body),
+                'summary': self.summarize_text(
+                    email_body,
+                    prefix="Summarize this email and extract key points:"
+                )
             }
 
+    def _analysis_prompt(self, email_subject, email_body, sender):
+        return (
+            "Analyze this email and return a single JSON object with exactly these keys:\n"
+            "- priority_analysis: object with\n"
+            "    - urgency_score (integer 1-5)\n"
+            "    - importance_score (integer 1-5)\n"
+            "    - reason (brief explanation)\n"
+            "    - suggested_response_time (immediate/within_hour/within_day/this_week)\n"
+            "- sentiment: object with\n"
+            "    - primary_emotion\n"
+            "    - secondary_emotions (array)\n"
+            "    - intensity (integer 1-5)\n"
+            "    - triggers (array of key phrases)\n"
+            "    - emoji (most appropriate emoji)\n"
+            "- summary: string with the main points, key action items, important "
+            "dates/deadlines and required responses, using bullet points\n\n"
+            "For priority consider subject and content urgency indicators, the sender's "
+            "role/relationship, time-sensitive elements and action requirements.\n"
+            "Emotions to consider: Joy, Anger, Disappointment, Anxiety, "
+            "Frustration, Sadness, Neutral, Funny, Excitement, Concern, "
+            "Gratitude, Urgency, Professional, Formal\n\n"
+            f"Subject: {email_subject}\n"
+            f"From: {sender}\n"
+            f"Content: {email_body.strip()[:3000]}\n\n"
+            "Return only the JSON object."
+        )
+
+    def _extract_json(self, response):
+        """Extract the outermost JSON object from a model response"""
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if not json_match:
+            raise ValueError("No JSON object in response")
+        return json.loads(json_match.group())
+
+    def _validate_analysis(self, data):
+        """Validate a fused analysis response against ANALYSIS_SCHEMA and normalize it"""
+        if not isinstance(data, dict):
+            raise ValueError("Analysis must be a JSON object")
+
+        result = {}
+        for section, fields in ANALYSIS_SCHEMA.items():
+            value = data.get(section)
+            if isinstance(fields, tuple):
+                expected, required = fields
+                if not isinstance(value, expected) or (required and not value):
+                    raise ValueError(f"Invalid or missing '{section}'")
+                result[section] = value.strip()
+                continue
+
+            if not isinstance(value, dict):
+                raise ValueError(f"Invalid or missing '{section}'")
+            defaults = DEFAULT_PRIORITY if section == 'priority_analysis' else DEFAULT_SENTIMENT
+            normalized = {}
+            for field, (expected, required) in fields.items():
+                if field not in value:
+                    if required:
+                        raise ValueError(f"Missing '{section}.{field}'")
+                    normalized[field] = self._coerce(defaults[field], expected, defaults[field])
+                    continue
+                normalized[field] = self._coerce(value[field], expected, defaults[field])
+            result[section] = normalized
+
+        priority = result['priority_analysis']
+        if priority['suggested_response_time'] not in RESPONSE_TIMES:
+            priority['suggested_response_time'] = DEFAULT_PRIORITY['suggested_response_time']
+        for field in ('urgency_score', 'importance_score'):
+            priority[field] = min(5, max(1, priority[field]))
+        sentiment = result['sentiment']
+        sentiment['intensity'] = min(5, max(1, sentiment['intensity']))
+        return result
+
+    def _coerce(self, value, expected, default):
+        """Coerce a JSON value to the expected type, falling back to the default"""
+        if expected is int:
+            try:
+                return int(round(float(value)))
+            except (TypeError, ValueError):
+                return default
+        if expected is list:
+            if isinstance(value, list):
+                return [str(v) for v in value]
+            return [str(value)] if value else []
+        return str(value) if value is not None else default
+
+    @_instrumented
     def detect_sentiment(self, text):
         """Enhanced sentiment analysis with detailed emotional tone detection"""
-        prompt = (
+        try:
+            return self._parse_sentiment(self._retry_generate(self._sentiment_prompt(text)))
+        except Exception:
+            return dict(DEFAULT_SENTIMENT)
+
+    def _sentiment_prompt(self, text):
+        return (
             "Analyze the emotional tone of this message. Consider:\n"
             "1. Primary emotion\n"
             "2. Secondary emotions\n"
@@ -82,137 +363,220 @@ class LLMResponder:
             "- triggers (array of key phrases)\n"
             "- emoji (most appropriate emoji)"
         )
-        
-        try:
-            response = self._retry_generate(prompt)
-            import json
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            return {
-                'primary_emotion': 'Neutral',
-                'secondary_emotions': [],
-                'intensity': 1,
-                'triggers': [],
-                'emoji': '😐'
-            }
-        except Exception as e:
-            return {
-                'primary_emotion': 'Neutral',
-                'secondary_emotions': [],
-                'intensity': 1,
-                'triggers': [],
-                'emoji': '😐'
-            }
 
-    def summarize_text(self, text, prefix="Summarize this text:", max_length=3000):
-        """Enhanced text summarization with key points extraction"""
+    def _parse_sentiment(self, response):
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        return dict(DEFAULT_SENTIMENT)
+
+    @_instrumented
+    def summarize_text(self, text, prefix="Summarize this text:", max_length=None, mode=None):
+        """Enhanced text summarization with key points extraction.
+
+        In 'truncate' mode only the first `max_length` characters are
+        summarized. In 'map_reduce' mode (the default) text longer than one
+        chunk is split on structural boundaries, the chunks are summarized
+        concurrently and their summaries are combined into the final summary.
+        """
+        text = text.strip()
+        mode = mode or self.summary_mode
+        if mode == 'map_reduce' and len(text) > self.summary_chunk_chars:
+            return self._map_reduce_summary(text, prefix)
+        return self._retry_generate(self._summary_prompt(text, prefix, max_length, mode)) or "No summary available."
+
+    def _summary_prompt(self, text, prefix, max_length, mode):
+        if mode == 'map_reduce':
+            max_length = max_length or self.summary_chunk_chars
+
         # Truncate text if too long
-        truncated_text = text.strip()[:max_length]
+        truncated_text = text[:max_length or self.summary_max_chars]
         
-        prompt = (
+        return (
             f"{prefix}\n\n"
             f"Text: {truncated_text}\n\n"
-            "Provide a comprehensive summary including:\n"
-            "1. Main points (bullet points)\n"
-            "2. Key action items (if any)\n"
-            "3. Important dates/deadlines (if any)\n"
-            "4. Required responses/actions (if any)\n"
-            "5. Context or background information\n\n"
-            "Format the response with clear sections and bullet points."
+            f"{SUMMARY_FORMAT}"
         )
-        
-        return self._retry_generate(prompt) or "No summary available."
 
-    def process_attachment(self, file_path, file_type):
-        """Process different types of attachments with appropriate handling"""
+    def _map_reduce_summary(self, text, prefix):
+        """Summarize long text hierarchically: chunk summaries, merged until they fit one prompt"""
+        chunks = self._summary_chunks(text)
+        if len(chunks) == 1:
+            return self.summarize_text(chunks[0], prefix, max_length=len(chunks[0]), mode='truncate')
+
+        summaries = self._map_summaries(self._section_prompts(chunks))
+        # Merge partial summaries in groups until they fit in a single reduce prompt
+        prompts = self._merge_prompts(summaries)
+        while prompts:
+            summaries = self._map_summaries(prompts)
+            prompts = self._merge_prompts(summaries)
+        return self._retry_generate(self._combined_summary_prompt(summaries, prefix)) or "No summary available."
+
+    def _summary_chunks(self, text):
+        """Split text on structural boundaries into chunks, stopping at the summary token budget"""
+        chunks = []
+        budget = self.summary_token_budget
+        for chunk in _split_structural(text, self.summary_chunk_chars):
+            budget -= estimate_tokens(chunk)
+            if budget < 0 and chunks:
+                print(f"Summary token budget reached; summarizing the first {len(chunks)} sections")
+                break
+            chunks.append(chunk)
+        return chunks
+
+    def _section_prompts(self, chunks):
+        # Chunk prompts depend only on the chunk text, so the LLM cache keys each
+        # summary by content and an edited document only re-summarizes changed chunks
+        return [
+            "Summarize this section of a longer document. Keep every key point, action item, "
+            f"date, deadline and required response.\n\nSection:\n{chunk}"
+            for chunk in chunks
+        ]
+
+    def _merge_prompts(self, summaries):
+        """Prompts merging partial summaries in groups, or None once they fit one reduce prompt"""
+        if len(summaries) <= 1 or sum(len(summary) for summary in summaries) <= self.summary_chunk_chars:
+            return None
+        groups = _split_structural("\n\n".join(summaries), self.summary_chunk_chars)
+        if len(groups) >= len(summaries):
+            return None
+        return [
+            "Combine these partial summaries of consecutive sections of a document into one "
+            f"summary. Keep every key point, action item, date and deadline.\n\n{group}"
+            for group in groups
+        ]
+
+    def _combined_summary_prompt(self, summaries, prefix):
+        combined = "\n\n".join(
+            f"Section {number}:\n{summary}" for number, summary in enumerate(summaries, 1))
+        return (
+            f"{prefix}\n\n"
+            "The document was summarized section by section. Section summaries:\n\n"
+            f"{combined}\n\n"
+            f"{SUMMARY_FORMAT}"
+        )
+
+    def _map_summaries(self, prompts):
+        """Run summary prompts concurrently, returning responses in prompt order"""
+        if len(prompts) == 1:
+            return [self._retry_generate(prompts[0])]
+        with ThreadPoolExecutor(max_workers=min(self.summary_max_workers, len(prompts))) as executor:
+            # Run each prompt in a copy of this context so metrics keep the calling method's label
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._retry_generate, prompt)
+                for prompt in prompts
+            ]
+            return [future.result() for future in futures]
+
+    def _document_char_budget(self):
+        """How much document text is worth extracting for one summary"""
+        if self.summary_mode == 'map_reduce':
+            return self.summary_token_budget * 4
+        return self.summary_max_chars
+
+    def process_attachment(self, source, file_type, text=None):
+        """Process different types of attachments with appropriate handling.
+
+        `source` is a file path, a bytes-like object or a binary file object.
+        `text` may carry previously extracted text so extraction is skipped.
+        """
         try:
-            if file_type.lower() == 'pdf':
-                return self._process_pdf(file_path)
-            elif file_type.lower() in ['docx', 'doc']:
-                return self._process_docx(file_path)
-            elif file_type.lower() == 'txt':
-                return self._process_txt(file_path)
-            elif file_type.lower() == 'csv':
-                return self._process_csv(file_path)
-            elif file_type.lower() in ['xlsx', 'xls']:
-                return self._process_excel(file_path)
-            else:
-                return f"[Unsupported file type: {file_type}]"
+            file_type = file_type.lower()
+            if file_type not in DOCUMENT_PREFIXES:
+                # Tabular profiles are returned as they are
+                return text if text is not None else self.extract_attachment_text(source, file_type)
+            if text is None:
+                text = self.extract_attachment_text(source, file_type)
+            return self.summarize_text(text, DOCUMENT_PREFIXES[file_type])
         except Exception as e:
             return f"[Error processing {file_type} file: {str(e)}]"
 
-    def _process_pdf(self, file_path):
-        """Process PDF files with text extraction and summarization"""
-        try:
-            import PyPDF2
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return self.summarize_text(text, "Summarize this PDF document:")
-        except Exception as e:
-            return f"[Error processing PDF: {str(e)}]"
+    @_instrumented
+    def extract_attachment_text(self, source, file_type):
+        """Extract the text of a document, or the data profile of a spreadsheet"""
+        return self._extract_text(source, file_type)
 
-    def _process_docx(self, file_path):
-        """Process DOCX files with text extraction and summarization"""
-        try:
-            import docx
-            doc = docx.Document(file_path)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return self.summarize_text(text, "Summarize this Word document:")
-        except Exception as e:
-            return f"[Error processing DOCX: {str(e)}]"
+    def _extract_text(self, source, file_type):
+        """Extract text or a profile, raising ValueError when the extractor reports an error.
 
-    def _process_txt(self, file_path):
-        """Process text files with summarization"""
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                text = file.read()
-                return self.summarize_text(text, "Summarize this text document:")
-        except Exception as e:
-            return f"[Error processing TXT: {str(e)}]"
+        The extractors return error markers as text; passing one on would
+        have the model summarize the error and cache that under the file's hash.
+        """
+        file_type = file_type.lower()
+        if file_type in DOCUMENT_PREFIXES:
+            # Stop reading long documents once the summarization budget is filled
+            text = self.file_processor.extract_text(source, file_type, max_chars=self._document_char_budget())
+        elif file_type == 'csv':
+            text = self._process_csv(source)
+        elif file_type in ['xlsx', 'xls']:
+            text = self._process_excel(source, file_type)
+        else:
+            text = f"[Unsupported file type: {file_type}]"
+        if text.startswith(EXTRACTION_ERROR_PREFIXES):
+            raise ValueError(text.strip('[]'))
+        return text
+
+    @_instrumented
+    def analyze_attachment(self, source, file_type, sha256=None, progress=None):
+        """Summarize an attachment and detect its sentiment, reusing stored results by content hash.
+
+        `progress(stage, percent)` is called as the work moves between stages.
+        """
+        progress = progress or (lambda stage, percent: None)
+        cached = None
+        if self.attachment_store is not None and sha256:
+            cached = self.attachment_store.get(sha256)
+            if cached and cached['summary'] is not None:
+                self._record('cache_hits_total', cache='attachment_summary')
+                return {'summary': cached['summary'], 'sentiment': cached['sentiment']}
+            self._record('cache_misses_total', cache='attachment_summary')
+
+        text = cached['text'] if cached else None
+        if text is None:
+            progress('extracting', 20)
+            try:
+                text = self.extract_attachment_text(source, file_type)
+            except Exception as e:
+                return _attachment_error(file_type, e)
+            if self.attachment_store is not None and sha256 and file_type.lower() in DOCUMENT_PREFIXES:
+                self.attachment_store.save_text(sha256, text)
 
-    def _process_csv(self, file_path):
+        progress('summarizing', 50)
+        summary = self.process_attachment(source, file_type, text=text)
+        if summary.startswith('[Error'):
+            # Neither analyzed nor stored, so the next request retries
+            return {'summary': summary, 'sentiment': dict(DEFAULT_SENTIMENT)}
+        progress('analyzing_sentiment', 85)
+        sentiment = self.detect_sentiment(summary)
+        if self.attachment_store is not None and sha256:
+            self.attachment_store.save_analysis(sha256, summary, sentiment)
+        return {'summary': summary, 'sentiment': sentiment}
+
+    def _process_csv(self, source):
         """Process CSV files with data analysis and summarization"""
         try:
-            import pandas as pd
-            df = pd.read_csv(file_path)
-            summary = f"CSV Summary:\nRows: {len(df)}\nColumns: {', '.join(df.columns)}\n"
-            summary += "\nColumn Statistics:\n"
-            for col in df.columns:
-                if df[col].dtype in ['int64', 'float64']:
-                    summary += f"{col}: min={df[col].min()}, max={df[col].max()}, mean={df[col].mean():.2f}\n"
-            return summary
+            return self.profiler.profile_csv(source)
         except Exception as e:
             return f"[Error processing CSV: {str(e)}]"
 
-    def _process_excel(self, file_path):
+    def _process_excel(self, source, file_type='xlsx'):
         """Process Excel files with data analysis and summarization"""
         try:
-            import pandas as pd
-            excel_file = pd.ExcelFile(file_path)
-            summary = "Excel Summary:\n"
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                summary += f"\nSheet: {sheet_name}\n"
-                summary += f"Rows: {len(df)}\nColumns: {', '.join(df.columns)}\n"
-                summary += "Column Statistics:\n"
-                for col in df.columns:
-                    if df[col].dtype in ['int64', 'float64']:
-                        summary += f"{col}: min={df[col].min()}, max={df[col].max()}, mean={df[col].mean():.2f}\n"
-            return summary
+            return self.profiler.profile_excel(source, file_type)
         except Exception as e:
             return f"[Error processing Excel: {str(e)}]"
 
+    @_instrumented
     def generate_reply_options(self, email_body, sender_name=None, num_options=3):
         """Generate personalized reply options with dynamic placeholders"""
+        return self._parse_reply_options(self._retry_generate(
+            self._reply_prompt(email_body, sender_name, num_options)))
+
+    def _reply_prompt(self, email_body, sender_name, num_options):
         # Extract potential placeholders
         placeholders = self._extract_placeholders(email_body)
         
-        prompt = (
+        return (
             f"The following is an email that needs a reply:\n\n{email_body.strip()}\n\n"
             f"Generate {num_options} professional, friendly email replies.\n"
             f"Sender's name: {sender_name if sender_name else 'Not provided'}\n\n"
@@ -235,7 +599,7 @@ class LLMResponder:
             "\n".join([f"- {p}" for p in placeholders])
         )
 
-        raw_output = self._retry_generate(prompt)
+    def _parse_reply_options(self, raw_output):
         blocks = raw_output.split("Subject:")[1:]
 
         options = []
@@ -276,11 +640,20 @@ class LLMResponder:
         
         return list(placeholders)
 
+    @_instrumented
     def rank_emails_by_importance(self, email_summaries):
         """Enhanced email ranking based on multiple factors"""
         if not email_summaries:
             return []
 
+        try:
+            return self._parse_ranking(self._retry_generate(self._ranking_prompt(email_summaries)),
+                                       len(email_summaries))
+        except Exception as e:
+            print(f"Error in email ranking: {str(e)}")
+            return list(range(len(email_summaries)))
+
+    def _ranking_prompt(self, email_summaries):
         prompt = (
             "You are an email assistant. Rank these emails by urgency and importance.\n"
             "Consider:\n"
@@ -308,31 +681,75 @@ class LLMResponder:
             "- suggested_actions (array of suggested actions for each email)\n\n"
             f"Note: Indices must be between 0 and {len(email_summaries) - 1}"
         )
+        return prompt
 
-        try:
-            response = self._retry_generate(prompt)
-            import json
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                ranking_data = json.loads(json_match.group())
-                indices = ranking_data.get('ranked_indices', [])
-                
-                # Validate indices
-                valid_indices = []
-                seen_indices = set()
-                for idx in indices:
-                    # Check if index is valid and not duplicate
-                    if isinstance(idx, int) and 0 <= idx < len(email_summaries) and idx not in seen_indices:
-                        valid_indices.append(idx)
-                        seen_indices.add(idx)
-                
-                # If we have valid indices, return them
-                if valid_indices:
-                    return valid_indices
-                
-            # Fallback: return indices in original order
-            return list(range(len(email_summaries)))
-        except Exception as e:
-            print(f"Error in email ranking: {str(e)}")
-            return list(range(len(email_summaries))) 
\ No newline at end of file
+    def _parse_ranking(self, response, count):
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            ranking_data = json.loads(json_match.group())
+            indices = ranking_data.get('ranked_indices', [])
+            
+            # Validate indices
+            valid_indices = []
+            seen_indices = set()
+            for idx in indices:
+                # Check if index is valid and not duplicate
+                if isinstance(idx, int) and 0 <= idx < count and idx not in seen_indices:
+                    valid_indices.append(idx)
+                    seen_indices.add(idx)
+            
+            # If we have valid indices, return them
+            if valid_indices:
+                return valid_indices
+            
+        # Fallback: return indices in original order
+        return list(range(count))
+
+
+def _attachment_error(file_type, error):
+    """Analysis result for an attachment that could not be read"""
+    return {
+        'summary': f"[Error processing {file_type} file: {str(error)}]",
+        'sentiment': dict(DEFAULT_SENTIMENT)
+    }
+
+
+def _split_structural(text, max_chars):
+    """Split text into chunks of at most max_chars, cutting on the strongest boundary available.
+
+    Paragraphs are packed into chunks, and a chunk is also closed after any
+    paragraph whose hash hits a fixed pattern once it is half full. Those
+    content-defined cuts mean an edit only shifts the chunk it falls in, so
+    the summaries of the other chunks stay cached.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for piece in _pieces(text, max_chars, 0):
+        if current and size + len(piece) > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if size >= max_chars // 2 and zlib.crc32(piece.encode('utf-8')) % 8 == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _pieces(text, max_chars, level):
+    """Yield non-empty pieces of text no longer than max_chars, splitting on finer boundaries as needed"""
+    if level == len(CHUNK_SEPARATORS):
+        for start in range(0, len(text), max_chars):
+            yield text[start:start + max_chars]
+        return
+    for part in CHUNK_SEPARATORS[level].split(text):
+        part = part.strip()
+        if not part:
+            continue
+        if len(part) <= max_chars:
+            yield part
+        else:
+            yield from _pieces(part, max_chars, level + 1)
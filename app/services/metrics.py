@@ -0,0 +1,155 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from cache hits to slow multi-email LLM requests
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Prompt and response size buckets in characters
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+# Metric families recorded by the routes and services: name -> (type, help, buckets)
+FAMILIES = {
+    'http_request_duration_seconds': ('histogram', 'Route latency by route, method and status', LATENCY_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled, by route', None),
+    'llm_method_calls_total': ('counter', 'LLMResponder method calls by method and status', None),
+    'llm_method_duration_seconds': ('histogram', 'LLMResponder method latency by method', LATENCY_BUCKETS),
+    'llm_generate_total': ('counter', 'Model generate calls by calling method and outcome', None),
+    'llm_generate_duration_seconds': ('histogram', 'Latency of single model generate calls', LATENCY_BUCKETS),
+    'llm_retries_total': ('counter', 'Model calls retried after rate limiting, by calling method', None),
+    'llm_prompt_chars': ('histogram', 'Prompt size in characters, by calling method', SIZE_BUCKETS),
+    'llm_response_chars': ('histogram', 'Response size in characters, by calling method', SIZE_BUCKETS),
+    'llm_requests_in_flight': ('gauge', 'Model generate calls currently running', None),
+    'gmail_api_calls_total': ('counter', 'Gmail API calls by method and status', None),
+    'gmail_api_duration_seconds': ('histogram', 'Gmail API call latency by method', LATENCY_BUCKETS),
+    'gmail_api_in_flight': ('gauge', 'Gmail API calls currently running', None),
+    'cache_hits_total': ('counter', 'Cache hits by cache', None),
+    'cache_misses_total': ('counter', 'Cache misses by cache', None),
+    'cache_hit_ratio': ('gauge', 'Cache hit ratio since start, by cache', None),
+    'cache_entries': ('gauge', 'Entries held in memory, by cache', None),
+    'rate_limiter_in_flight': ('gauge', 'Gemini calls holding a rate limiter slot, by limiter', None),
+    'rate_limiter_concurrency_limit': ('gauge', 'Current AIMD concurrency limit for Gemini calls, by limiter', None),
+    'rate_limiter_throttled_total': ('counter', 'Gemini calls rejected with 429, by limiter', None),
+    'rate_limiter_queue_wait_seconds_total': ('counter', 'Time spent waiting for rate limiter budget, by limiter', None),
+    'jobs_running': ('gauge', 'Background jobs running in this worker', None),
+    'reply_prefetch_total': ('counter', 'Speculative reply generations by outcome', None)
+}
+
+
+class Metrics:
+    """In-process counters, gauges and histograms exposed in the Prometheus text format.
+
+    Recording a sample is a dict update under one lock, cheap enough to leave
+    on for every request. Collectors registered with `add_collector` are
+    called only when metrics are rendered, for values such as cache hit
+    ratios that other services already track. Each gunicorn worker keeps its
+    own metrics, so scrapes see the worker that answered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = dict(FAMILIES)
+        self._samples = {}
+        self._collectors = []
+
+    def describe(self, name, metric_type, help_text, buckets=None):
+        """Declare a metric family; samples of undeclared names are kept but not rendered"""
+        with self._lock:
+            self._families[name] = (metric_type, help_text, buckets)
+        return name
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter or gauge"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + value
+
+    def dec(self, name, value=1, **labels):
+        self.inc(name, -value, **labels)
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._samples[key] = value
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation"""
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._families[name][2]
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            state = self._samples.get(key)
+            if state is None:
+                state = self._samples[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the block into a latency histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(self, collector):
+        """Register `collector()` returning [(name, labels dict, value)] to sample at render time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        collected = []
+        for collector in self._collectors:
+            try:
+                collected.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {str(e)}")
+
+        with self._lock:
+            samples = {key: (list(value[0]), value[1], value[2]) if isinstance(value, list) else value
+                       for key, value in self._samples.items()}
+            families = dict(self._families)
+        for name, labels, value in collected:
+            samples[(name, tuple(sorted(labels.items())))] = value
+
+        by_name = {}
+        for (name, labels), value in samples.items():
+            if name in families:
+                by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            metric_type, help_text, buckets = families[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_value(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,201 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from app.services.llm import DEFAULT_PRIORITY, DEFAULT_SENTIMENT
+
+
+class EmailAnalysisPipeline:
+    """Runs the independent LLM analyses for a batch of emails on a bounded worker pool"""
+
+    def __init__(self, llm_responder, max_workers=4, scorer=None):
+        self.llm = llm_responder
+        self.max_workers = max(1, int(max_workers))
+        self.scorer = scorer
+
+    def analyze(self, emails, attachments=None):
+        """Analyze emails concurrently and return the results in input order.
+
+        `attachments` maps an email id to the attachment records returned by
+        GmailClient.get_attachments. Gmail calls stay on the caller's thread; only
+        the LLM work is fanned out to the pool.
+        """
+        results = dict(self.iter_analyze(emails, attachments))
+        return [results[index] for index in range(len(emails))]
+
+    def iter_analyze(self, emails, attachments=None):
+        """Yield (input index, analysis) pairs as soon as each email's analyses finish"""
+        attachments = attachments or {}
+        scores = self.scorer.score_all(emails) if self.scorer else [None] * len(emails)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            pending = {}
+            owners = {}
+            for index, email in enumerate(emails):
+                futures = self._submit(executor, email, attachments.get(email['id'], []), scores[index])
+                tasks = [futures['analysis']] + futures['attachments']
+                pending[index] = (email, futures, len(tasks))
+                for future in tasks:
+                    owners[future] = index
+
+            remaining = {index: count for index, (_, _, count) in pending.items()}
+            for future in as_completed(owners):
+                index = owners[future]
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    email, futures, _ = pending[index]
+                    yield index, self._collect(email, futures)
+        finally:
+            # Drop queued work if the consumer stops early (e.g. a client disconnect)
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, executor, email, attachments, score=None):
+        """Schedule every independent analysis of a single email.
+
+        Emails the heuristic scorer is confident are low-signal get a
+        synthesized analysis instead of an LLM call.
+        """
+        if score is not None and score['skip_llm']:
+            analysis = Future()
+            analysis.set_result(self.scorer.synthesize_analysis(email, score))
+        else:
+            analysis = executor.submit(
+                self.llm.analyze_email,
+                email['subject'],
+                email['body'],
+                email['from']
+            )
+        return {
+            'analysis': analysis,
+            'attachments': [
+                executor.submit(self._process_attachment, attachment) for attachment in attachments
+            ]
+        }
+
+    def _process_attachment(self, attachment):
+        """Summarize a downloaded attachment and detect its sentiment"""
+        analysis = self.llm.analyze_attachment(*_attachment_args(attachment))
+        return {
+            'filename': attachment['filename'],
+            'summary': analysis['summary'],
+            'sentiment': analysis['sentiment']
+        }
+
+    def _collect(self, email, futures):
+        """Assemble one email's analysis, isolating failures to that email"""
+        try:
+            analysis = futures['analysis'].result()
+            error = None
+        except Exception as e:
+            print(f"Error analyzing email {email['id']}: {str(e)}")
+            analysis = {}
+            error = str(e)
+        priority_analysis = analysis.get('priority_analysis') or dict(DEFAULT_PRIORITY)
+        attachment_summaries = []
+        for future in futures['attachments']:
+            summary = _result(future, None)
+            if summary is not None:
+                attachment_summaries.append(summary)
+
+        result = {
+            'id': email['id'],
+            'from': email['from'],
+            'subject': email['subject'],
+            'body': email['body'],
+            'received': email.get('received'),
+            'summary': analysis.get('summary') or "No summary available.",
+            'priority_analysis': priority_analysis,
+            'sentiment': analysis.get('sentiment') or dict(DEFAULT_SENTIMENT),
+            'attachments': attachment_summaries,
+            'suggested_response_time': priority_analysis.get('suggested_response_time', 'this_week')
+        }
+        if error:
+            result['analysis_error'] = error
+        return result
+
+
+class AsyncEmailAnalysisPipeline:
+    """Coroutine front end for an EmailAnalysisPipeline: every analysis is a task on the running event loop.
+
+    Wraps a sync pipeline for its heuristic scorer and result assembly, and
+    runs the model calls through an AsyncLLMResponder. They are bounded by
+    the responder's rate limiter rather than by the pipeline's worker pool.
+    """
+
+    def __init__(self, pipeline, llm_responder):
+        self.pipeline = pipeline
+        self.llm = llm_responder
+
+    async def analyze(self, emails, attachments=None):
+        """Analyze emails concurrently and return the results in input order"""
+        results = {index: analysis async for index, analysis in self.iter_analyze(emails, attachments)}
+        return [results[index] for index in range(len(emails))]
+
+    async def iter_analyze(self, emails, attachments=None):
+        """Yield (input index, analysis) pairs as soon as each email's analyses finish"""
+        attachments = attachments or {}
+        scorer = self.pipeline.scorer
+        scores = scorer.score_all(emails) if scorer else [None] * len(emails)
+        loop = asyncio.get_running_loop()
+        pending = {}
+        owners = {}
+        try:
+            for index, email in enumerate(emails):
+                futures = self._create_tasks(loop, email, attachments.get(email['id'], []), scores[index])
+                tasks = [futures['analysis']] + futures['attachments']
+                pending[index] = (email, futures)
+                for task in tasks:
+                    owners[task] = index
+
+            remaining = {index: 0 for index in pending}
+            for index in owners.values():
+                remaining[index] += 1
+            waiting = set(owners)
+            while waiting:
+                done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = owners[task]
+                    remaining[index] -= 1
+                    if remaining[index] == 0:
+                        email, futures = pending[index]
+                        yield index, self.pipeline._collect(email, futures)
+        finally:
+            # Drop unfinished work if the consumer stops early (e.g. a client disconnect)
+            for task in owners:
+                task.cancel()
+
+    def _create_tasks(self, loop, email, attachments, score=None):
+        """Schedule every independent analysis of a single email as tasks"""
+        if score is not None and score['skip_llm']:
+            analysis = loop.create_future()
+            analysis.set_result(self.pipeline.scorer.synthesize_analysis(email, score))
+        else:
+            analysis = loop.create_task(self.llm.analyze_email(email['subject'], email['body'], email['from']))
+        return {
+            'analysis': analysis,
+            'attachments': [loop.create_task(self._process_attachment(attachment)) for attachment in attachments]
+        }
+
+    async def _process_attachment(self, attachment):
+        """Summarize a downloaded attachment and detect its sentiment"""
+        analysis = await self.llm.analyze_attachment(*_attachment_args(attachment))
+        return {
+            'filename': attachment['filename'],
+            'summary': analysis['summary'],
+            'sentiment': analysis['sentiment']
+        }
+
+
+def _attachment_args(attachment):
+    """(source, file type, sha256) for analyze_attachment from a downloaded attachment record"""
+    file_type = attachment['filename'].split('.')[-1].lower()
+    # Prefer the in-memory bytes so small attachments are never read back from disk
+    source = attachment['data'] if attachment.get('data') is not None else attachment['path']
+    return source, file_type, attachment['sha256']
+
+
+def _result(future, fallback):
+    """Return a future's result, or the fallback if the task failed"""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Error in email analysis task: {str(e)}")
+        return fallback
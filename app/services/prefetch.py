@@ -0,0 +1,173 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Speculative generations are budgeted over this rolling window, in seconds
+BUDGET_WINDOW = 3600
+
+
+def reply_sender_name(sender):
+    """The sender name the reply modal sends to /suggest-reply for an email's From header"""
+    return sender.split('@')[0]
+
+
+class ReplyPrefetcher:
+    """Generates reply options for the most important emails before the user asks for them.
+
+    After an inbox page is ranked, reply options for its top `top_k` emails
+    are generated on a small background pool. Results are cached by body
+    hash, sender name and option count, so /suggest-reply answers from
+    memory, or waits for a generation already running rather than starting
+    a second one. At most `hourly_budget` speculative generations start per
+    rolling hour, and queued ones are cancelled once a fresh first page shows
+    their emails have left the top of the inbox.
+    """
+
+    def __init__(self, llm_responder, top_k=3, num_options=3, hourly_budget=60, max_entries=256, ttl=3600,
+                 max_workers=2):
+        self.llm = llm_responder
+        self.top_k = top_k
+        self.num_options = num_options
+        self.hourly_budget = hourly_budget
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.outcomes = {'generated': 0, 'failed': 0, 'cancelled': 0, 'over_budget': 0}
+        # key -> (future, created); finished and in-flight generations alike
+        self._entries = OrderedDict()
+        # Speculative generations that have not finished, by key
+        self._pending = {}
+        # Start times of speculative generations within the budget window
+        self._spent = deque()
+        # Futures may run their callbacks on the thread that holds the lock
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reply-prefetch')
+
+    @staticmethod
+    def make_key(body, sender_name, num_options):
+        """Hash the email body, sender name and option count into a cache key"""
+        digest = hashlib.sha256()
+        digest.update(body.strip().encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(str(sender_name or '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(str(num_options).encode('utf-8'))
+        return digest.hexdigest()
+
+    def prefetch(self, ranked_emails, replace=False):
+        """Queue reply generation for the top_k of a ranked page; returns how many were queued.
+
+        Pass `replace` for the inbox's first page: queued generations for
+        emails that are no longer among its top_k are cancelled first.
+        """
+        targets = OrderedDict()
+        for email in ranked_emails[:self.top_k]:
+            if email.get('body', '').strip():
+                sender_name = reply_sender_name(email.get('from', ''))
+                targets[self.make_key(email['body'], sender_name, self.num_options)] = (email['body'], sender_name)
+
+        queued = 0
+        with self._lock:
+            if replace:
+                for key in [key for key in self._pending if key not in targets]:
+                    self._pending[key].cancel()
+
+            now = time.time()
+            while self._spent and now - self._spent[0] > BUDGET_WINDOW:
+                self._spent.popleft()
+            for key, (body, sender_name) in targets.items():
+                if self._lookup(key, now) is not None:
+                    continue
+                if len(self._spent) >= self.hourly_budget:
+                    self.outcomes['over_budget'] += 1
+                    continue
+                self._spent.append(now)
+                future = self._executor.submit(self.llm.generate_reply_options, body, sender_name, self.num_options)
+                self._pending[key] = future
+                self._remember(key, future, now)
+                future.add_done_callback(lambda future, key=key: self._finished(key, future))
+                queued += 1
+        return queued
+
+    def get(self, body, sender_name, num_options):
+        """Return cached reply options, waiting for a running generation; None on a miss.
+
+        A generation still queued behind others is cancelled and reported as
+        a miss, so the caller generates on demand instead of waiting its turn.
+        """
+        key = self.make_key(body, sender_name, num_options)
+        with self._lock:
+            future = self._lookup(key, time.time())
+            if future is not None and future.cancel():
+                future = None
+            if future is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def put(self, body, sender_name, num_options, options):
+        """Cache reply options generated on demand"""
+        future = Future()
+        future.set_result(options)
+        with self._lock:
+            self._remember(self.make_key(body, sender_name, num_options), future, time.time())
+
+    def stats(self):
+        """Return hit/miss counters, speculative generation outcomes and the number of cached entries"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._entries),
+                'pending': len(self._pending),
+                'outcomes': dict(self.outcomes)
+            }
+
+    def _lookup(self, key, now):
+        """Return the future cached for a key, dropping it if it has expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        future, created = entry
+        if self.ttl and now - created > self.ttl and future.done():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return future
+
+    def _remember(self, key, future, created):
+        """Insert a future, evicting the least recently used finished entries"""
+        self._entries[key] = (future, created)
+        self._entries.move_to_end(key)
+        for old_key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[old_key][0].done():
+                del self._entries[old_key]
+
+    def _finished(self, key, future):
+        """Record a speculative generation's outcome; failed and cancelled ones are not cached"""
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if future.cancelled():
+                outcome = 'cancelled'
+                # Cancelled work never reached the model, so it does not count against the budget
+                if self._spent:
+                    self._spent.pop()
+            elif future.exception() is not None:
+                outcome = 'failed'
+            else:
+                outcome = 'generated'
+            self.outcomes[outcome] += 1
+            if outcome != 'generated' and self._entries.get(key, (None,))[0] is future:
+                del self._entries[key]
@@ -0,0 +1,116 @@
+import re
+from email.utils import parseaddr
+
+# Phrases typical of bulk or automated mail, with how strongly each suggests low signal
+LOW_SIGNAL_PHRASES = {
+    'unsubscribe': 0.35,
+    'view in browser': 0.25,
+    'view this email in your browser': 0.25,
+    'manage preferences': 0.2,
+    'email preferences': 0.2,
+    'newsletter': 0.2,
+    'this is an automated message': 0.3,
+    'do not reply': 0.25,
+    'weekly digest': 0.2,
+    'promotion': 0.1,
+    'limited time offer': 0.15
+}
+
+AUTOMATED_SENDER = re.compile(
+    r'^(?:no-?reply|do-?not-?reply|notifications?|newsletters?|news|updates|marketing|'
+    r'mailer-daemon|alerts?|info|digest)\b',
+    re.IGNORECASE
+)
+
+
+class HeuristicScorer:
+    """Fast local scoring that decides which emails can skip the LLM priority analysis.
+
+    Every keyword table is compiled into a single alternation so each email is
+    scanned once per table. An email is treated as low-signal when it carries
+    bulk-mail markers, comes from an automated sender or a configured bulk
+    domain, and has no urgency keywords; its confidence is the sum of those
+    markers, capped at 1.
+    """
+
+    def __init__(self, urgency_keywords, low_signal_domains=(), important_domains=(), threshold=0.7):
+        self.urgency_keywords = {k.lower(): v for k, v in urgency_keywords.items()}
+        self.low_signal_domains = {d.lower() for d in low_signal_domains}
+        self.important_domains = {d.lower() for d in important_domains}
+        self.threshold = threshold
+        self._urgency_pattern = _alternation(self.urgency_keywords)
+        self._low_signal_pattern = _alternation(LOW_SIGNAL_PHRASES)
+
+    def score(self, email):
+        """Score one email dict with 'subject', 'body' and 'from'"""
+        text = f"{email['subject']}\n{email['body']}"
+        urgency_hits = {m.lower() for m in self._urgency_pattern.findall(text)}
+        low_signal_hits = {m.lower() for m in self._low_signal_pattern.findall(text)}
+
+        address = parseaddr(email['from'])[1].lower()
+        local_part, _, domain = address.partition('@')
+        automated = bool(AUTOMATED_SENDER.match(local_part))
+        bulk_domain = _matches_domain(domain, self.low_signal_domains)
+        important_domain = _matches_domain(domain, self.important_domains)
+
+        urgency = max((self.urgency_keywords[hit] for hit in urgency_hits), default=1)
+        confidence = 0.0
+        if not urgency_hits and not important_domain:
+            confidence = sum(LOW_SIGNAL_PHRASES[hit] for hit in low_signal_hits)
+            confidence += 0.4 if automated else 0.0
+            confidence += 0.5 if bulk_domain else 0.0
+        confidence = min(1.0, confidence)
+
+        reasons = []
+        if automated:
+            reasons.append('automated sender')
+        if bulk_domain:
+            reasons.append(f'bulk sender domain {domain}')
+        if low_signal_hits:
+            reasons.append('bulk-mail markers: ' + ', '.join(sorted(low_signal_hits)))
+
+        return {
+            'urgency_score': urgency,
+            'importance_score': 4 if important_domain else (1 if confidence else 2),
+            'low_signal_confidence': round(confidence, 2),
+            'skip_llm': confidence >= self.threshold,
+            'reasons': reasons
+        }
+
+    def score_all(self, emails):
+        """Score a batch of emails"""
+        return [self.score(email) for email in emails]
+
+    def synthesize_analysis(self, email, score):
+        """Build an analyze_email-shaped result for an email that skips the LLM"""
+        excerpt = ' '.join(email['body'].split())[:280]
+        return {
+            'priority_analysis': {
+                'urgency_score': 1,
+                'importance_score': score['importance_score'],
+                'reason': 'Low-signal email (' + '; '.join(score['reasons']) + '); skipped AI analysis',
+                'suggested_response_time': 'this_week'
+            },
+            'sentiment': {
+                'primary_emotion': 'Neutral',
+                'secondary_emotions': [],
+                'intensity': 1,
+                'triggers': [],
+                'emoji': '📰'
+            },
+            'summary': f"Automated or bulk message: {excerpt}" if excerpt else "Automated or bulk message."
+        }
+
+
+def _alternation(phrases):
+    """Compile phrases into one case-insensitive, longest-first alternation"""
+    ordered = sorted(phrases, key=len, reverse=True)
+    return re.compile(
+        r'(?<!\w)(' + '|'.join(re.escape(p) for p in ordered) + r')(?!\w)',
+        re.IGNORECASE
+    )
+
+
+def _matches_domain(domain, domains):
+    """Whether domain equals or is a subdomain of any configured domain"""
+    return any(domain == d or domain.endswith('.' + d) for d in domains)
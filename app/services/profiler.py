@@ -0,0 +1,206 @@
+import random
+import numbers
+import numpy as np
+import pandas as pd
+from app.services.file_processor import open_binary
+
+
+class TabularProfiler:
+    """Bounded-memory statistics for spreadsheet and CSV attachments.
+
+    CSV files are read in fixed-size chunks with running statistics. Each
+    workbook sheet is read once, row by row. At most `max_rows` data rows are kept
+    per sheet; past that a uniform reservoir sample of rows is kept while the
+    remaining rows are only counted, and the profile says the statistics were
+    computed from a sample. Column statistics are computed in one vectorized
+    aggregation over the kept rows.
+    """
+
+    def __init__(self, max_rows=100000, seed=0, chunk_rows=50000, sketch_size=1024, preview_rows=5):
+        self.max_rows = max_rows
+        self.seed = seed
+        self.chunk_rows = chunk_rows
+        self.sketch_size = sketch_size
+        self.preview_rows = preview_rows
+
+    def profile_csv(self, source):
+        """Return the text profile of a CSV file, reading it in chunks of chunk_rows rows.
+
+        Every cell is read as text and numeric columns are chosen once, from
+        the first chunk. Counts, nulls, min, max and mean are exact and kept
+        as running totals; distinct counts come from a k-minimum-values
+        sketch and are exact below sketch_size distinct values.
+        """
+        with open_binary(source) as file:
+            reader = pd.read_csv(file, chunksize=self.chunk_rows, dtype=str)
+            columns = None
+            for chunk in reader:
+                if columns is None:
+                    columns = list(chunk.columns)
+                    numeric_columns = [
+                        column for column in chunk.columns
+                        if chunk[column].notna().any()
+                        and pd.to_numeric(chunk[column], errors='coerce').count() == chunk[column].count()
+                    ]
+                    preview = chunk.head(self.preview_rows)
+                    rows = 0
+                    nulls = pd.Series(0, index=chunk.columns)
+                    totals = pd.DataFrame(
+                        {'min': np.inf, 'max': -np.inf, 'sum': 0.0, 'count': 0}, index=numeric_columns)
+                    sketches = {column: np.empty(0, dtype=np.uint64) for column in chunk.columns}
+
+                rows += len(chunk)
+                nulls += chunk.isna().sum()
+                if numeric_columns:
+                    values = chunk[numeric_columns].apply(pd.to_numeric, errors='coerce')
+                    chunk_stats = values.agg(['min', 'max', 'sum', 'count']).T
+                    totals['min'] = np.fmin(totals['min'], chunk_stats['min'])
+                    totals['max'] = np.fmax(totals['max'], chunk_stats['max'])
+                    totals['sum'] += chunk_stats['sum']
+                    totals['count'] += chunk_stats['count']
+                for column in chunk.columns:
+                    sketches[column] = self._update_sketch(sketches[column], chunk[column])
+
+        if columns is None:
+            return "CSV Summary:\nRows: 0\nColumns: \n"
+
+        summary = f"CSV Summary:\nRows: {rows}\nColumns: {', '.join(str(column) for column in columns)}\n"
+        summary += "\nColumn Statistics:\n"
+        for column in numeric_columns:
+            stats = totals.loc[column]
+            if stats['count']:
+                summary += (f"{column}: min={_number(stats['min'])}, max={_number(stats['max'])}, "
+                            f"mean={stats['sum'] / stats['count']:.2f}")
+                ignored = rows - nulls[column] - stats['count']
+                if ignored:
+                    summary += f" ({int(ignored)} non-numeric values ignored)"
+                summary += "\n"
+        summary += "\nColumn Profile:\n"
+        for column in columns:
+            distinct, exact = self._estimate_distinct(sketches[column])
+            summary += (f"{column}: nulls={int(nulls[column])}, "
+                        f"distinct={'' if exact else '~'}{distinct}\n")
+        if len(preview):
+            summary += f"\nPreview (first {len(preview)} rows):\n"
+            summary += preview.to_string(index=False) + "\n"
+        return summary
+
+    def _update_sketch(self, sketch, values):
+        """Merge a column chunk into its k-minimum-values sketch of 64-bit value hashes"""
+        hashes = pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+        merged = np.unique(np.concatenate([sketch, hashes]))
+        return merged[:self.sketch_size]
+
+    def _estimate_distinct(self, sketch):
+        """Return (distinct count, exact) from a sketch"""
+        if len(sketch) < self.sketch_size:
+            return len(sketch), True
+        # The k-th smallest of n uniform hashes sits near k / n of the hash range
+        kth = float(sketch[-1]) / float(2 ** 64)
+        return int((self.sketch_size - 1) / kth), False
+
+    def profile_excel(self, source, file_type='xlsx'):
+        """Return the text profile of a workbook given as a path, bytes or file object"""
+        if file_type.lower() == 'xls':
+            sheets = self._legacy_sheets(source)
+        else:
+            sheets = self._stream_sheets(source)
+
+        summary = "Excel Summary:\n"
+        for sheet_name, header, rows, total in sheets:
+            summary += f"\nSheet: {sheet_name}\n"
+            summary += self._describe(header, rows, total)
+        return summary
+
+    def _stream_sheets(self, source):
+        """Yield (name, header, kept rows, total rows) for each sheet using openpyxl read-only mode"""
+        from openpyxl import load_workbook
+        with open_binary(source) as file:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+            try:
+                for worksheet in workbook.worksheets:
+                    rows = worksheet.iter_rows(values_only=True)
+                    header = next(rows, None)
+                    if header is None:
+                        yield worksheet.title, [], [], 0
+                        continue
+                    header = _column_names(header)
+                    kept, total = self._reservoir(rows, len(header))
+                    yield worksheet.title, header, kept, total
+            finally:
+                workbook.close()
+
+    def _legacy_sheets(self, source):
+        """Yield sheets of an .xls workbook, which openpyxl cannot read, parsing each sheet once"""
+        with open_binary(source) as file:
+            excel_file = pd.ExcelFile(file)
+            for sheet_name in excel_file.sheet_names:
+                df = excel_file.parse(sheet_name)
+                header = [str(column) for column in df.columns]
+                kept, total = self._reservoir(df.itertuples(index=False, name=None), len(header))
+                yield sheet_name, header, kept, total
+
+    def _reservoir(self, rows, width):
+        """Keep the first max_rows rows, then a uniform sample of max_rows; return (kept, total)"""
+        rng = random.Random(self.seed)
+        kept = []
+        total = 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if total < self.max_rows:
+                kept.append(row)
+            else:
+                slot = rng.randrange(total + 1)
+                if slot < self.max_rows:
+                    kept[slot] = row
+            total += 1
+        return kept, total
+
+    def _describe(self, header, rows, total):
+        """Format row/column counts and min/max/mean of the numeric columns"""
+        summary = f"Rows: {total}\nColumns: {', '.join(header)}\n"
+        if total > len(rows):
+            summary += f"Statistics: sampled ({len(rows)} of {total} rows)\n"
+        else:
+            summary += "Statistics: exact\n"
+        summary += "Column Statistics:\n"
+        if not rows:
+            return summary
+
+        df = pd.DataFrame.from_records(rows, columns=range(len(header)))
+        numeric = {column: df[column] for column in df.select_dtypes('number').columns}
+        # Dates, times and booleans are never numeric; a text or mixed column is
+        # numeric only when every non-empty cell is a number or parses as one
+        for column in df.select_dtypes(exclude=['number', 'bool', 'datetime', 'datetimetz', 'timedelta']).columns:
+            values = df[column].dropna()
+            if not all(_numeric_type(kind) for kind in set(map(type, values))):
+                continue
+            parsed = pd.to_numeric(values, errors='coerce')
+            if parsed.notna().all():
+                numeric[column] = parsed
+        numeric_columns = [column for column in df.columns if column in numeric and numeric[column].count()]
+        if not numeric_columns:
+            return summary
+        stats = pd.DataFrame({column: numeric[column] for column in numeric_columns}).agg(['min', 'max', 'mean'])
+        for column in numeric_columns:
+            column_stats = stats[column]
+            summary += (f"{header[column]}: min={_number(column_stats['min'])}, "
+                        f"max={_number(column_stats['max'])}, mean={column_stats['mean']:.2f}\n")
+        return summary
+
+
+def _column_names(header):
+    """Header cells as strings, naming blank cells the way pandas does"""
+    return [str(value) if value is not None else f"Unnamed: {index}" for index, value in enumerate(header)]
+
+
+def _numeric_type(kind):
+    """Whether cells of this Python type may be numbers: numbers other than booleans, or text"""
+    return issubclass(kind, (str, numbers.Number)) and not issubclass(kind, (bool, np.bool_))
+
+
+def _number(value):
+    """Show whole numbers without the trailing .0 that the aggregation adds"""
+    return int(value) if float(value).is_integer() else value
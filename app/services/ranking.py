@@ -0,0 +1,93 @@
+import time
+from email.utils import parseaddr
+
+# Hours within which an email should be answered, by suggested response time
+RESPONSE_DEADLINES = {
+    'immediate': 1,
+    'within_hour': 1,
+    'within_day': 24,
+    'this_week': 168
+}
+
+# Extra weight for suggested response times, on the same 1-5 scale as the scores
+RESPONSE_TIME_SCORES = {
+    'immediate': 5,
+    'within_hour': 4,
+    'within_day': 2,
+    'this_week': 1
+}
+
+
+class RankingEngine:
+    """Deterministic local ranking of analyzed emails.
+
+    Each email's score is a weighted sum of its urgency and importance scores,
+    its suggested response time, its sentiment intensity, how far it is
+    towards or past its response deadline, and the weight configured for its
+    sender address or domain. Ties keep inbox order.
+    """
+
+    def __init__(self, sender_weights=None, urgency_weight=1.0, importance_weight=0.8,
+                 response_time_weight=0.5, sentiment_weight=0.2, age_weight=1.0):
+        self.sender_weights = {k.lower(): v for k, v in (sender_weights or {}).items()}
+        self.urgency_weight = urgency_weight
+        self.importance_weight = importance_weight
+        self.response_time_weight = response_time_weight
+        self.sentiment_weight = sentiment_weight
+        self.age_weight = age_weight
+        self._sender_cache = {}
+
+    def score(self, email, now=None):
+        """Score one analyzed email; higher means it should be handled sooner"""
+        now = time.time() if now is None else now
+        priority = email.get('priority_analysis') or {}
+        response_time = priority.get('suggested_response_time') or email.get('suggested_response_time')
+
+        score = self.urgency_weight * _number(priority.get('urgency_score'), 1)
+        score += self.importance_weight * _number(priority.get('importance_score'), 1)
+        score += self.response_time_weight * RESPONSE_TIME_SCORES.get(response_time, 1)
+        score += self.sentiment_weight * _number((email.get('sentiment') or {}).get('intensity'), 1)
+
+        received = email.get('received')
+        if received:
+            # Grows with the share of the response deadline used up; overdue mail tops out at 2
+            deadline = RESPONSE_DEADLINES.get(response_time, 168) * 3600
+            score += self.age_weight * min(2.0, max(0.0, now - received) / deadline)
+
+        return score + self.sender_weight(email.get('from', ''))
+
+    def sender_weight(self, sender):
+        """Weight for the sender's exact address, else its domain or a parent domain"""
+        if not self.sender_weights:
+            return 0.0
+        weight = self._sender_cache.get(sender)
+        if weight is None:
+            if len(self._sender_cache) >= 10000:
+                self._sender_cache.clear()
+            weight = self._sender_cache[sender] = self._lookup_sender(sender)
+        return weight
+
+    def _lookup_sender(self, sender):
+        address = parseaddr(sender)[1].lower()
+        if address in self.sender_weights:
+            return self.sender_weights[address]
+        domain = address.partition('@')[2]
+        while domain:
+            if domain in self.sender_weights:
+                return self.sender_weights[domain]
+            domain = domain.partition('.')[2]
+        return 0.0
+
+    def rank(self, emails, now=None):
+        """Return email indices from most to least important"""
+        now = time.time() if now is None else now
+        keys = [(self.score(email, now), -index) for index, email in enumerate(emails)]
+        return [-index for _, index in sorted(keys, reverse=True)]
+
+
+def _number(value, default):
+    """Numeric score from an LLM field, falling back to default when it is missing or malformed"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
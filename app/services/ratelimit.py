@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from google.api_core.exceptions import TooManyRequests
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms only get per-process limiting
+    fcntl = None
+
+# Seconds of budget a bucket may accumulate, so bursts stay well inside the per-minute quota
+BURST_SECONDS = 10
+MAX_PENALTY = 32
+
+# Outcomes of a limited call, as passed to RateLimiter.release
+SUCCESS = 'success'
+THROTTLED = 'throttled'
+ERROR = 'error'
+
+
+class RateLimiter:
+    """Token-bucket limiter for Gemini calls with AIMD concurrency control.
+
+    Requests-per-minute and tokens-per-minute budgets are kept in a JSON state
+    file guarded by an flock, so every thread and gunicorn worker sharing
+    `state_path` draws from the same buckets. Without a state path (or on
+    platforms without fcntl) the buckets are per-process.
+
+    The number of concurrent calls per process grows by 1/limit on every
+    success and halves on every 429; other failures leave it unchanged, so a
+    failing backend does not drive concurrency up. A 429 also pauses all
+    callers sharing the state for an exponentially growing penalty.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, state_path=None,
+                 max_concurrency=8, min_concurrency=1, throttle_exceptions=(TooManyRequests,)):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state_path = state_path if fcntl else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.throttle_exceptions = throttle_exceptions
+
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+        self._slots = threading.Condition()
+        self._state_lock = threading.Lock()
+        self._state = None
+        if self.state_path:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def limit(self, tokens=1):
+        """Hold a concurrency slot and budget for one call and feed its outcome into AIMD"""
+        self.acquire(tokens)
+        outcome = ERROR
+        try:
+            yield
+            outcome = SUCCESS
+        except self.throttle_exceptions:
+            outcome = THROTTLED
+            raise
+        finally:
+            self.release(outcome)
+
+    def acquire(self, tokens=1):
+        """Block until a concurrency slot and enough request/token budget are available"""
+        start = time.monotonic()
+        with self._slots:
+            while self.in_flight >= max(self.min_concurrency, int(self.concurrency_limit)):
+                self._slots.wait()
+            self.in_flight += 1
+
+        try:
+            while True:
+                wait = self._with_state(lambda state: self._take(state, tokens))
+                if wait <= 0:
+                    break
+                time.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+        except BaseException:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - start
+        with self._slots:
+            self.requests += 1
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+        return waited
+
+    @asynccontextmanager
+    async def limit_async(self, tokens=1):
+        """`limit` for coroutines: waiting for a slot or budget never blocks the event loop"""
+        await self.acquire_async(tokens)
+        outcome = ERROR
+        try:
+            yield
+            outcome = SUCCESS
+        except self.throttle_exceptions:
+            outcome = THROTTLED
+            raise
+        finally:
+            await self.release_async(outcome)
+
+    async def acquire_async(self, tokens=1):
+        """Wait without blocking the event loop for a concurrency slot and request/token budget.
+
+        Slots are shared with threads calling `acquire`; coroutines poll for a
+        free slot instead of waiting on the condition variable. A shared state
+        file is read and written in the default executor.
+        """
+        start = time.monotonic()
+        while True:
+            with self._slots:
+                if self.in_flight < max(self.min_concurrency, int(self.concurrency_limit)):
+                    self.in_flight += 1
+                    break
+            await asyncio.sleep(0.01 + random.uniform(0, 0.01))
+
+        try:
+            while True:
+                wait = await self._with_state_async(lambda state: self._take(state, tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+        except BaseException:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - start
+        with self._slots:
+            self.requests += 1
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+        return waited
+
+    def release(self, outcome=SUCCESS):
+        """Return the concurrency slot and feed the call outcome into AIMD.
+
+        SUCCESS grows the concurrency limit and clears the shared penalty,
+        THROTTLED halves the limit and extends the penalty, and ERROR leaves
+        both unchanged.
+        """
+        if outcome == THROTTLED:
+            self._with_state(self._penalize)
+        elif outcome == SUCCESS:
+            self._with_state(self._reset_penalty)
+        with self._slots:
+            if outcome == THROTTLED:
+                self.throttled += 1
+                self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+            elif outcome == SUCCESS:
+                self.concurrency_limit = min(
+                    float(self.max_concurrency), self.concurrency_limit + 1 / self.concurrency_limit)
+        self._release_slot()
+
+    async def release_async(self, outcome=SUCCESS):
+        """`release` for coroutines; a shared state file is updated in the default executor"""
+        if self.state_path:
+            await asyncio.to_thread(self.release, outcome)
+        else:
+            self.release(outcome)
+
+    def stats(self):
+        """Return request, throttle and queue-wait counters"""
+        with self._slots:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'in_flight': self.in_flight,
+                'concurrency_limit': round(self.concurrency_limit, 2),
+                'queue_wait_total': round(self.queue_wait_total, 3),
+                'queue_wait_max': round(self.queue_wait_max, 3),
+                'queue_wait_avg': round(self.queue_wait_total / self.requests, 3) if self.requests else 0.0
+            }
+
+    def _release_slot(self):
+        with self._slots:
+            self.in_flight -= 1
+            self._slots.notify()
+
+    def _take(self, state, tokens):
+        """Refill the buckets and take budget; return 0 on success or seconds to wait"""
+        now = time.time()
+        request_rate = self.requests_per_minute / 60.0
+        token_rate = self.tokens_per_minute / 60.0
+        request_capacity = max(1.0, request_rate * BURST_SECONDS)
+        token_capacity = max(float(tokens), token_rate * BURST_SECONDS)
+
+        elapsed = max(0.0, now - state.get('updated', now))
+        state['requests'] = min(request_capacity, state.get('requests', request_capacity) + elapsed * request_rate)
+        state['tokens'] = min(token_capacity, state.get('tokens', token_capacity) + elapsed * token_rate)
+        state['updated'] = now
+
+        backoff = state.get('backoff_until', 0) - now
+        if backoff > 0:
+            return backoff
+        if state['requests'] < 1:
+            return (1 - state['requests']) / request_rate
+        if state['tokens'] < tokens:
+            return (tokens - state['tokens']) / token_rate
+
+        state['requests'] -= 1
+        state['tokens'] -= tokens
+        return 0
+
+    def _penalize(self, state):
+        penalty = min(MAX_PENALTY, state.get('penalty', 0.5) * 2)
+        state['penalty'] = penalty
+        state['backoff_until'] = max(state.get('backoff_until', 0), time.time() + penalty)
+
+    def _reset_penalty(self, state):
+        state['penalty'] = 0.5
+
+    def _with_state(self, fn):
+        """Run fn on the shared bucket state under a thread lock and, if configured, a file lock"""
+        with self._state_lock:
+            if not self.state_path:
+                if self._state is None:
+                    self._state = {}
+                return fn(self._state)
+
+            with open(self.state_path, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    result = fn(state)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                    return result
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    async def _with_state_async(self, fn):
+        """_with_state without blocking the event loop on the file lock"""
+        if not self.state_path:
+            return self._with_state(fn)
+        return await asyncio.to_thread(self._with_state, fn)
+
+
+def estimate_tokens(text):
+    """Rough token count used for the tokens-per-minute budget (about 4 characters per token)"""
+    return max(1, len(text) // 4)
@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class MessageStore:
+    """SQLite store of fetched inbox messages and sync state"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id TEXT PRIMARY KEY, raw TEXT NOT NULL, internal_date INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_internal_date ON messages (internal_date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get_state(self, key, default=None):
+        row = self._connect().execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def message_ids(self):
+        return {row[0] for row in self._connect().execute("SELECT id FROM messages")}
+
+    def save_messages(self, messages):
+        """Insert or refresh raw message resources"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO messages (id, raw, internal_date, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET raw = excluded.raw, "
+                "internal_date = excluded.internal_date, updated = excluded.updated",
+                [(msg['id'], json.dumps(msg), int(msg.get('internalDate', 0)), now) for msg in messages]
+            )
+
+    def remove_messages(self, msg_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM messages WHERE id = ?", [(msg_id,) for msg_id in msg_ids])
+
+    def retain_messages(self, msg_ids):
+        """Drop every stored message that is not in msg_ids"""
+        self.remove_messages(self.message_ids() - set(msg_ids))
+
+    def latest_messages(self, limit):
+        """Return raw message resources, newest first"""
+        rows = self._connect().execute(
+            "SELECT raw FROM messages ORDER BY internal_date DESC, id LIMIT ?", (limit,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
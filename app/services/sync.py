@@ -0,0 +1,94 @@
+from googleapiclient.errors import HttpError
+from app.services.gmail import ParsedMessage
+
+UNREAD_INBOX = {'INBOX', 'UNREAD'}
+
+
+class InboxSync:
+    """Keeps a MessageStore in step with the first page of the unread inbox using the Gmail history API.
+
+    The first refresh (or one after the stored history id has expired, or with
+    a different page size) lists one page of the unread inbox and stores its
+    messages and the page token that follows it. Later refreshes ask the
+    history API whether the unread inbox changed and serve the stored page
+    when it did not; when it did, the page is listed again so the stored
+    page token stays valid, and only messages not already stored are fetched.
+    """
+
+    def __init__(self, gmail_client, store, max_results=10):
+        self.gmail = gmail_client
+        self.store = store
+        self.max_results = max_results
+
+    def refresh(self, max_results=None):
+        """Sync the store and return (newest unread messages as ParsedMessage objects, next page token)"""
+        max_results = max_results or self.max_results
+        history_id = self.store.get_state('history_id')
+        if history_id and self.store.get_state('page_size') == str(max_results):
+            try:
+                changed, latest = self._inbox_changed(history_id)
+            except HttpError as e:
+                if getattr(e.resp, 'status', None) != 404:
+                    raise
+                print(f"History id {history_id} expired, falling back to a full sync")
+                changed = True
+            if changed:
+                self._full_sync(max_results)
+            else:
+                self.store.set_state('history_id', str(latest))
+        else:
+            self._full_sync(max_results)
+
+        messages = [ParsedMessage(raw) for raw in self.store.latest_messages(max_results)]
+        return messages, self.store.get_state('next_page_token') or None
+
+    def _full_sync(self, max_results):
+        """List the first page of the unread inbox and replace the stored message set"""
+        # Read the history id first so changes made during the listing are seen next time
+        history_id = self.gmail.get_history_id()
+        unread_ids, next_page_token = self.gmail.list_unread_page(max_results)
+        self.store.retain_messages(unread_ids)
+        known = self.store.message_ids()
+        new_ids = [msg_id for msg_id in unread_ids if msg_id not in known]
+        if new_ids:
+            self.store.save_messages([message.raw for message in self.gmail.get_messages(new_ids)])
+        self.store.set_state('next_page_token', next_page_token or '')
+        self.store.set_state('page_size', str(max_results))
+        self.store.set_state('history_id', str(history_id))
+
+    def _inbox_changed(self, history_id):
+        """Return (whether the unread inbox changed since history_id, latest history id)"""
+        records, latest = self.gmail.list_history(history_id)
+        added, removed = _changed_messages(records)
+        return bool(added or removed), latest
+
+
+def _changed_messages(records):
+    """Reduce history records to (ids now unread in the inbox, ids that left it)"""
+    added = {}
+    removed = set()
+
+    def mark_added(msg_id):
+        added[msg_id] = True
+        removed.discard(msg_id)
+
+    def mark_removed(msg_id):
+        added.pop(msg_id, None)
+        removed.add(msg_id)
+
+    for record in records:
+        for item in record.get('messagesAdded', []):
+            message = item['message']
+            if UNREAD_INBOX <= set(message.get('labelIds', [])):
+                mark_added(message['id'])
+        for item in record.get('labelsAdded', []):
+            message = item['message']
+            if UNREAD_INBOX <= set(message.get('labelIds', [])):
+                mark_added(message['id'])
+        for item in record.get('labelsRemoved', []):
+            if UNREAD_INBOX & set(item.get('labelIds', [])):
+                mark_removed(item['message']['id'])
+        for item in record.get('messagesDeleted', []):
+            mark_removed(item['message']['id'])
+
+    return list(added), removed
@@ -1,6 +1,9 @@
 // State management
 let currentEmails = [];
 let selectedEmail = null;
+let nextPageToken = null;
+// Index in currentEmails where the page being loaded starts; each page is ranked on its own
+let pageStart = 0;
 
 // Upload area state management
 function updateUploadAreaState(isGmailConnected) {
@@ -67,50 +70,124 @@ document.getElementById('authBtn').addEventListener('click', async () => {
     }
 });
 
-// Load emails
-async function loadEmails() {
+// Load the first page of emails, or the next page when pageToken is given,
+// rendering each card as soon as its analysis is streamed in
+async function loadEmails(pageToken = null) {
     const emailList = document.getElementById('emailList');
     const loadingState = document.getElementById('loadingState');
     const noEmailsState = document.getElementById('noEmailsState');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
 
-    emailList.innerHTML = '';
+    if (!pageToken) {
+        emailList.innerHTML = '';
+        currentEmails = [];
+    }
+    emailList.querySelectorAll('.page-error').forEach(element => element.remove());
+    pageStart = currentEmails.length;
+    nextPageToken = null;
+    loadMoreBtn.classList.add('hidden');
     loadingState.classList.remove('hidden');
     noEmailsState.classList.add('hidden');
 
     try {
-        const response = await fetch('/emails');
-        const data = await response.json();
+        const url = pageToken ? `/emails/stream?page_token=${encodeURIComponent(pageToken)}` : '/emails/stream';
+        const response = await fetch(url);
+        if (!response.ok || !response.body) {
+            throw new Error(`Failed to load emails (${response.status})`);
+        }
 
-        if (data.status === 'success') {
-            currentEmails = data.emails;
+        // The response is newline-delimited JSON; a chunk may end mid-line
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleEmailEvent(JSON.parse(line)));
+            if (done) break;
+        }
+        if (buffer.trim()) {
+            handleEmailEvent(JSON.parse(buffer));
+        }
 
-            if (currentEmails.length === 0) {
-                noEmailsState.classList.remove('hidden');
-            } else {
-                currentEmails.forEach(email => {
-                    const card = createEmailCard(email);
-                    emailList.appendChild(card);
-                });
-            }
-        } else {
-            throw new Error(data.message);
+        if (currentEmails.length === 0) {
+            noEmailsState.classList.remove('hidden');
         }
     } catch (error) {
-        emailList.innerHTML = `
-            <div class="p-4 bg-red-100 text-red-700 rounded-md">
+        const errorHtml = `
+            <div class="page-error p-4 bg-red-100 text-red-700 rounded-md">
                 <i class="fas fa-exclamation-circle mr-2"></i>
                 ${error.message}
             </div>
         `;
+        if (pageToken) {
+            // Keep the cards already loaded and let "Load more" retry this page
+            emailList.insertAdjacentHTML('beforeend', errorHtml);
+            nextPageToken = nextPageToken || pageToken;
+        } else {
+            emailList.innerHTML = errorHtml;
+        }
     } finally {
         loadingState.classList.add('hidden');
+        if (nextPageToken) {
+            loadMoreBtn.classList.remove('hidden');
+        }
+    }
+}
+
+// Handle one event from the /emails/stream response
+function handleEmailEvent(event) {
+    if (event.type === 'email') {
+        // Pages can overlap when the inbox changes between requests
+        if (currentEmails.some(email => email.id === event.email.id)) {
+            return;
+        }
+        currentEmails.push(event.email);
+        document.getElementById('emailList').appendChild(createEmailCard(event.email));
+    } else if (event.type === 'ranking') {
+        reorderEmails(event.ranked_ids);
+        nextPageToken = event.next_page_token;
+    } else if (event.type === 'error') {
+        throw new Error(event.message);
     }
 }
 
+// Reorder the rendered cards of the current page to match its ranking
+function reorderEmails(rankedIds) {
+    const emailList = document.getElementById('emailList');
+    const pageEmails = currentEmails.slice(pageStart);
+    const emailsById = new Map(pageEmails.map(email => [email.id, email]));
+    const cardsById = new Map(
+        Array.from(emailList.children).map(card => [card.dataset.emailId, card])
+    );
+
+    // Emails missing from the ranking keep their arrival order after the ranked ones
+    const ranked = rankedIds.map(id => emailsById.get(id)).filter(Boolean);
+    const unranked = pageEmails.filter(email => !rankedIds.includes(email.id));
+    const reordered = ranked.concat(unranked);
+    currentEmails = currentEmails.slice(0, pageStart).concat(reordered);
+    reordered.forEach(email => {
+        const card = cardsById.get(email.id);
+        if (card) {
+            emailList.appendChild(card);
+        }
+    });
+}
+
+// Load more emails
+document.getElementById('loadMoreBtn').addEventListener('click', () => {
+    if (nextPageToken) {
+        loadEmails(nextPageToken);
+    }
+});
+
 // Create email card
 function createEmailCard(email) {
     const div = document.createElement('div');
     div.className = 'email-card bg-white rounded-lg shadow p-6 cursor-pointer';
+    div.dataset.emailId = email.id;
 
     // Get priority and sentiment indicators
     const priority = email.priority_analysis;
@@ -519,6 +596,33 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
+    // Reflect a job's stage in the upload progress bar
+    function setUploadProgress(percent, stage) {
+        uploadProgress.querySelector('.bg-blue-600').style.width = `${percent}%`;
+        uploadProgress.querySelector('span').textContent = `${stage.replace(/_/g, ' ')} (${percent}%)`;
+    }
+
+    // Poll a background job until it finishes; resolves to the same shape the upload used to return
+    async function waitForJob(statusUrl) {
+        while (true) {
+            const response = await fetch(statusUrl);
+            const data = await response.json();
+            if (data.status !== 'success') {
+                throw new Error(data.message);
+            }
+
+            const job = data.job;
+            setUploadProgress(job.progress, job.stage);
+            if (job.status === 'done') {
+                return { status: 'success', file_info: job.result };
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Processing failed');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
     async function handleFileUpload(file) {
         // Show upload status
         uploadStatus.classList.remove('hidden');
@@ -530,12 +634,17 @@ document.addEventListener('DOMContentLoaded', function () {
         formData.append('file', file);
 
         try {
+            setUploadProgress(0, 'uploading');
             const response = await fetch('/upload-file', {
                 method: 'POST',
                 body: formData
             });
 
-            const data = await response.json();
+            const submitted = await response.json();
+            if (submitted.status !== 'accepted') {
+                throw new Error(submitted.message);
+            }
+            const data = await waitForJob(submitted.status_url);
 
             if (data.status === 'success') {
                 // Show success result
@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# Serve with an ASGI server, e.g.: hypercorn asgi:app --bind 0.0.0.0:5000
+app = create_asgi_app()
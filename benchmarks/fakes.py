@@ -0,0 +1,352 @@
+import io
+import json
+import time
+import asyncio
+import random
+import base64
+import threading
+from google.api_core.exceptions import TooManyRequests
+from app.services.gmail import GmailClient
+
+# Attachments above this size are served through attachments().get, like Gmail does
+INLINE_ATTACHMENT_BYTES = 4096
+
+ATTACHMENT_MIXES = {
+    'none': [],
+    'light': ['txt'],
+    'mixed': ['txt', 'csv', 'pdf'],
+    'heavy': ['pdf', 'csv', 'xlsx', 'docx', 'pdf']
+}
+
+SUBJECTS = [
+    "Quarterly report draft", "URGENT: contract deadline tomorrow", "Team lunch on Friday",
+    "Weekly newsletter", "Invoice #{n} overdue", "Re: project kickoff notes", "Action required: access review"
+]
+
+SENDERS = [
+    "Alice Manager <alice@example.com>", "billing@vendor.example", "newsletter@news.example",
+    "Bob Client <bob@client.example>", "noreply@notifications.example"
+]
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def synthetic_attachment(kind, n, size_factor=1):
+    """Return (filename, mime type, bytes) for a synthetic attachment of the given kind"""
+    rng = random.Random(n)
+    if kind == 'txt':
+        words = ' '.join(rng.choice(['budget', 'review', 'deadline', 'team', 'client', 'plan'])
+                         for _ in range(400 * size_factor))
+        return f"notes_{n}.txt", 'text/plain', words.encode('utf-8')
+    if kind == 'csv':
+        rows = ["date,region,amount,units"]
+        rows += [f"2024-01-{i % 28 + 1:02d},{rng.choice('NSEW')},{rng.random() * 1000:.2f},{rng.randint(1, 50)}"
+                 for i in range(2000 * size_factor)]
+        return f"export_{n}.csv", 'text/csv', "\n".join(rows).encode('utf-8')
+    if kind == 'pdf':
+        import fitz
+        doc = fitz.open()
+        for page_number in range(10 * size_factor):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Report {n} page {page_number}\n" + "Revenue grew in every region. " * 30)
+        return f"report_{n}.pdf", 'application/pdf', doc.tobytes()
+    if kind == 'xlsx':
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['region', 'amount', 'units'])
+        for i in range(2000 * size_factor):
+            sheet.append([rng.choice('NSEW'), rng.random() * 1000, rng.randint(1, 50)])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return f"sheet_{n}.xlsx", 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', buffer.getvalue()
+    if kind == 'docx':
+        import docx
+        document = docx.Document()
+        for i in range(100 * size_factor):
+            document.add_paragraph(f"Section {i}: the proposal covers scope, pricing and timeline.")
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return f"proposal_{n}.docx", 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', buffer.getvalue()
+    raise ValueError(f"Unknown attachment kind: {kind}")
+
+
+class FakeRequest:
+    """Stands in for a googleapiclient HttpRequest: execute() sleeps for the latency and returns the result"""
+
+    def __init__(self, service, method, result):
+        self.service = service
+        self.method = method
+        self.result = result
+
+    def execute(self):
+        self.service.record(self.method)
+        time.sleep(self.service.latency)
+        return self.result() if callable(self.result) else self.result
+
+
+class FakeBatch:
+    """Stands in for BatchHttpRequest: one round trip for every added request"""
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        self.service.record('batch')
+        time.sleep(self.service.latency)
+        for request, request_id in self.requests:
+            try:
+                response = request.result() if callable(request.result) else request.result
+                self.callback(request_id, response, None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+class FakeGmailService:
+    """In-memory Gmail API with the same users().messages() call shapes as the discovery client.
+
+    Serves `inbox_size` synthetic multipart messages, each with the
+    attachments of the chosen mix, and adds `latency` seconds to every call.
+    """
+
+    def __init__(self, inbox_size=20, attachment_mix='none', latency=0.02, seed=0):
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._attachments = {}
+        self.inbox = {}
+        rng = random.Random(seed)
+        kinds = ATTACHMENT_MIXES[attachment_mix]
+        now_ms = int(time.time() * 1000)
+        for n in range(inbox_size):
+            msg_id = f"msg{n:05d}"
+            self.inbox[msg_id] = self._message(msg_id, n, kinds, rng, now_ms - n * 600000)
+        self.history_id = str(1000 + inbox_size)
+
+    def _message(self, msg_id, n, kinds, rng, internal_date):
+        body = (f"Hi,\n\nPlease review the attached material for item {n}. "
+                + "We need a decision on the budget and timeline this week. " * rng.randint(2, 20)
+                + "\n\nThanks")
+        parts = [{'mimeType': 'text/plain', 'filename': '', 'body': {'data': _b64(body.encode('utf-8'))}}]
+        # Each email gets one attachment kind, cycling through the mix
+        if kinds:
+            kind = kinds[n % len(kinds)]
+            filename, mime_type, data = synthetic_attachment(kind, n)
+            attachment_body = {'size': len(data)}
+            if len(data) <= INLINE_ATTACHMENT_BYTES:
+                attachment_body['data'] = _b64(data)
+            else:
+                attachment_id = f"att-{msg_id}"
+                attachment_body['attachmentId'] = attachment_id
+                self._attachments[attachment_id] = _b64(data)
+            parts.append({'mimeType': mime_type, 'filename': filename, 'body': attachment_body})
+        return {
+            'id': msg_id,
+            'threadId': msg_id,
+            'historyId': '1000',
+            'labelIds': ['INBOX', 'UNREAD'],
+            'internalDate': str(internal_date),
+            'payload': {
+                'mimeType': 'multipart/mixed',
+                'headers': [
+                    {'name': 'Subject', 'value': SUBJECTS[n % len(SUBJECTS)].format(n=n)},
+                    {'name': 'From', 'value': SENDERS[n % len(SENDERS)]},
+                    {'name': 'Date', 'value': time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime(internal_date / 1000))}
+                ],
+                'parts': parts
+            }
+        }
+
+    def record(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    # Resource tree: service.users().messages().get(...), service.users().history().list(...)
+    def users(self):
+        return self
+
+    def messages(self):
+        return _Messages(self)
+
+    def history(self):
+        return _History(self)
+
+    def getProfile(self, userId):
+        return FakeRequest(self, 'getProfile', {'historyId': self.history_id})
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+
+class _Messages:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, userId, labelIds=None, q=None, maxResults=None, pageToken=None):
+        ids = sorted(self.service.inbox, key=lambda msg_id: -int(self.service.inbox[msg_id]['internalDate']))
+        start = int(pageToken or 0)
+        end = start + (maxResults or 100)
+        response = {'messages': [{'id': msg_id, 'threadId': msg_id} for msg_id in ids[start:end]],
+                    'resultSizeEstimate': len(ids)}
+        if end < len(ids):
+            response['nextPageToken'] = str(end)
+        return FakeRequest(self.service, 'messages.list', response)
+
+    def get(self, userId, id, format='full'):
+        return FakeRequest(self.service, 'messages.get', lambda: self.service.inbox[id])
+
+    def attachments(self):
+        return _Attachments(self.service)
+
+    def send(self, userId, body):
+        return FakeRequest(self.service, 'messages.send', {'id': 'sent', 'labelIds': ['SENT']})
+
+    def modify(self, userId, id, body):
+        return FakeRequest(self.service, 'messages.modify', {'id': id})
+
+
+class _Attachments:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, userId, messageId, id):
+        return FakeRequest(self.service, 'messages.attachments.get',
+                           lambda: {'data': self.service._attachments[id]})
+
+
+class _History:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, userId, startHistoryId, labelId=None, historyTypes=None, pageToken=None):
+        return FakeRequest(self.service, 'history.list', {'historyId': self.service.history_id})
+
+
+class _ValidCredentials:
+    valid = True
+    token = 'fake-token'
+    refresh_token = None
+
+
+class FakeGmailClient(GmailClient):
+    """GmailClient whose every thread talks to one shared FakeGmailService"""
+
+    def __init__(self, fake_service, **kwargs):
+        super().__init__(creds_path=None, token_path=None, **kwargs)
+        self.fake_service = fake_service
+        self.credentials = _ValidCredentials()
+
+    def _build_service(self):
+        return self.fake_service
+
+    def authenticate(self):
+        return self.service
+
+
+def fake_gmail_transport(fake_service):
+    """httpx transport serving the Gmail REST API from a FakeGmailService, for AsyncGmailClient"""
+    import httpx
+
+    async def handle(request):
+        path = request.url.path.split('/users/me/', 1)[1].split('/')
+        params = request.url.params
+        messages = fake_service.messages()
+        if path == ['messages']:
+            fake = messages.list('me', maxResults=int(params.get('maxResults', 100)), pageToken=params.get('pageToken'))
+        elif len(path) == 2 and path[1] == 'send':
+            fake = messages.send('me', json.loads(request.content))
+        elif len(path) == 2:
+            fake = messages.get('me', path[1])
+        elif path[2] == 'modify':
+            fake = messages.modify('me', path[1], json.loads(request.content))
+        else:
+            fake = messages.attachments().get('me', path[1], path[3])
+        fake_service.record(fake.method)
+        await asyncio.sleep(fake_service.latency)
+        try:
+            result = fake.result() if callable(fake.result) else fake.result
+        except KeyError:
+            return httpx.Response(404, json={'error': {'code': 404}})
+        return httpx.Response(200, json=result)
+
+    return httpx.MockTransport(handle)
+
+
+class FakeGeminiModel:
+    """Stands in for genai.GenerativeModel with configurable latency, errors and 429s"""
+
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, throttle_rate=0.0, seed=0):
+        self.model_name = 'fake-gemini'
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.prompt_chars = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        roll, delay = self._start(prompt)
+        time.sleep(delay)
+        return self._finish(roll, prompt)
+
+    async def generate_content_async(self, prompt):
+        roll, delay = self._start(prompt)
+        await asyncio.sleep(delay)
+        return self._finish(roll, prompt)
+
+    def _start(self, prompt):
+        """Count the call and draw its outcome and latency"""
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+            roll = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        return roll, delay
+
+    def _finish(self, roll, prompt):
+        if roll < self.throttle_rate:
+            with self._lock:
+                self.throttled += 1
+            raise TooManyRequests("Resource has been exhausted (fake)")
+        if roll < self.throttle_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise RuntimeError("Internal error (fake)")
+        return _Response(self._respond(prompt))
+
+    def _respond(self, prompt):
+        """Plausible output for each prompt shape LLMResponder sends"""
+        sentiment = {'primary_emotion': 'Professional', 'secondary_emotions': ['Concern'],
+                     'intensity': 2, 'triggers': ['deadline'], 'emoji': '💼'}
+        priority = {'urgency_score': 3, 'importance_score': 3, 'reason': 'Requests a decision this week',
+                    'suggested_response_time': 'within_day'}
+        if 'priority_analysis' in prompt:
+            return json.dumps({'priority_analysis': priority, 'sentiment': sentiment,
+                               'summary': '- Review requested\n- Decision due this week'})
+        if prompt.startswith('Analyze this email for urgency'):
+            return json.dumps(priority)
+        if prompt.startswith('Analyze the emotional tone'):
+            return json.dumps(sentiment)
+        if 'email replies' in prompt:
+            return "\n\n".join(
+                f"Subject: Re: your email (option {i})\nBody: Hi [NAME],\n\nThanks, I will review the "
+                f"[DETAILS] by [DATE].\n\nBest,\nJainil Desai" for i in range(1, 4))
+        if 'ranked_indices' in prompt:
+            return json.dumps({'ranked_indices': [], 'reasons': [], 'suggested_actions': []})
+        return "Main points:\n- The document reports steady growth\n- Budget review is due this week"
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
@@ -0,0 +1,410 @@
+"""Offline benchmarks for /emails, /suggest-reply and /upload-file against fake Gmail and Gemini backends.
+
+Usage:
+    python -m benchmarks.run                      # default scenario matrix, JSON on stdout
+    python -m benchmarks.run --quick --output results.json
+    python -m benchmarks.run --endpoint emails --inbox-size 50 --attachments mixed --concurrency 4
+    python -m benchmarks.run --endpoint suggest_reply --server asgi --concurrency 50
+
+Each scenario runs in a fresh process so caches and peak RSS are its own.
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import itertools
+import subprocess
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_scenarios(quick=False):
+    """The scenario matrix: inbox sizes and attachment mixes for /emails, concurrency for every endpoint.
+
+    Scenarios run on the Flask app unless they set 'server' to 'asgi', which
+    serves /emails and /suggest-reply from the asyncio routes instead.
+    """
+    if quick:
+        inbox_sizes, mixes, concurrency_levels = [10], ['none', 'mixed'], [1, 4]
+    else:
+        inbox_sizes, mixes, concurrency_levels = [10, 50], ['none', 'mixed', 'heavy'], [1, 4, 8]
+    scenarios = []
+    for inbox_size, mix, concurrency in itertools.product(inbox_sizes, mixes, concurrency_levels):
+        scenarios.append({'endpoint': 'emails', 'inbox_size': inbox_size, 'attachments': mix, 'store': 'cold',
+                          'concurrency': concurrency, 'requests': max(4, concurrency * 2)})
+    # Repeat requests served from the analysis store, measured separately from analysis itself
+    for inbox_size in inbox_sizes:
+        scenarios.append({'endpoint': 'emails', 'inbox_size': inbox_size, 'attachments': 'mixed', 'store': 'warm',
+                          'concurrency': 1, 'requests': 4})
+    for concurrency in concurrency_levels:
+        scenarios.append({'endpoint': 'suggest_reply', 'concurrency': concurrency,
+                          'requests': max(8, concurrency * 4)})
+        scenarios.append({'endpoint': 'upload_file', 'attachments': 'mixed', 'concurrency': concurrency,
+                          'requests': max(6, concurrency * 3)})
+    for concurrency in concurrency_levels:
+        scenarios.append({'endpoint': 'emails', 'server': 'asgi', 'inbox_size': inbox_sizes[0],
+                          'attachments': 'mixed', 'store': 'cold', 'concurrency': concurrency,
+                          'requests': max(4, concurrency * 2)})
+        scenarios.append({'endpoint': 'suggest_reply', 'server': 'asgi', 'concurrency': concurrency,
+                          'requests': max(8, concurrency * 4)})
+    return scenarios
+
+
+def run_scenario(scenario, options):
+    """Run one scenario in this process and return its result dict"""
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    workdir = tempfile.mkdtemp(prefix='email-agent-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    from config import Config
+    Config.ATTACHMENT_STORE_DIR = os.path.join(workdir, 'attachments')
+    Config.JOB_STORE_PATH = os.path.join(workdir, 'jobs.sqlite3')
+    Config.MESSAGE_STORE_PATH = os.path.join(workdir, 'messages.sqlite3')
+    Config.ANALYSIS_STORE_PATH = os.path.join(workdir, 'analyses.sqlite3')
+    Config.GEMINI_RATE_LIMIT_STATE_PATH = ''
+    # The async responder builds its own limiter from these
+    Config.GEMINI_REQUESTS_PER_MINUTE = options['requests_per_minute']
+    Config.GEMINI_TOKENS_PER_MINUTE = 10 ** 9
+    Config.INBOX_SYNC_MODE = options['sync_mode']
+    if not options['reply_prefetch']:
+        Config.REPLY_PREFETCH_TOP_K = 0
+
+    from app import create_app
+    from app import routes
+    from app.services.llm import LLMResponder
+    from app.services.cache import LLMCache
+    from app.services.ratelimit import RateLimiter
+    from app.services.file_processor import FileProcessor
+    from app.services.attachment_store import AttachmentStore
+    from benchmarks.fakes import FakeGmailService, FakeGmailClient, FakeGeminiModel, synthetic_attachment
+
+    gmail = FakeGmailService(
+        inbox_size=scenario.get('inbox_size', 10),
+        attachment_mix=scenario.get('attachments', 'none'),
+        latency=options['gmail_latency']
+    )
+    model = FakeGeminiModel(
+        latency=options['llm_latency'],
+        jitter=options['llm_jitter'],
+        error_rate=options['error_rate'],
+        throttle_rate=options['throttle_rate']
+    )
+    routes.attachment_store = AttachmentStore(Config.ATTACHMENT_STORE_DIR)
+    routes.gmail_client = FakeGmailClient(
+        gmail,
+        save_dir=os.path.join(workdir, 'uploads'),
+        attachment_store=routes.attachment_store,
+        metrics=routes.metrics
+    )
+    routes.file_processor = FileProcessor()
+    routes.llm_responder = LLMResponder(
+        model,
+        cache=LLMCache(disk_path=None) if options['llm_cache'] else None,
+        attachment_store=routes.attachment_store,
+        rate_limiter=RateLimiter(
+            requests_per_minute=options['requests_per_minute'],
+            tokens_per_minute=10 ** 9,
+            max_concurrency=Config.ANALYSIS_MAX_WORKERS
+        ),
+        file_processor=routes.file_processor,
+        metrics=routes.metrics
+    )
+    app = create_app()
+    routes.init_services()
+
+    uploads = itertools.count()
+    upload_kinds = {'none': ['txt'], 'light': ['txt'], 'mixed': ['txt', 'csv', 'pdf'],
+                    'heavy': ['pdf', 'csv', 'xlsx', 'docx']}[scenario.get('attachments', 'mixed')]
+    context = {'synthetic_attachment': synthetic_attachment, 'uploads': uploads,
+               'upload_kinds': upload_kinds, 'lock': threading.Lock(),
+               # A cold store has every request analyze the page again
+               'emails_path': '/emails' if scenario.get('store') == 'warm' else '/emails?refresh=1'}
+
+    if scenario.get('store') == 'warm':
+        # Fill the analysis store, then count only the measured requests
+        _emails_request(app.test_client(), context)
+        model.calls = model.throttled = model.errors = model.prompt_chars = 0
+        gmail.calls.clear()
+
+    if scenario.get('server') == 'asgi':
+        request_fn = {
+            'emails': _emails_request_async,
+            'suggest_reply': _suggest_reply_request_async
+        }[scenario['endpoint']]
+        latencies, failures, wall = asyncio.run(_run_async_clients(gmail, request_fn, context, scenario))
+    else:
+        request_fn = {
+            'emails': _emails_request,
+            'suggest_reply': _suggest_reply_request,
+            'upload_file': _upload_request
+        }[scenario['endpoint']]
+        latencies, failures, wall = _run_thread_clients(app, request_fn, context, scenario)
+
+    return {
+        'scenario': scenario,
+        'requests': len(latencies),
+        'failures': len(failures),
+        'failure_samples': failures[:3],
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(latencies) / wall, 3) if wall else None,
+        'latency_seconds': {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'max': round(max(latencies), 4) if latencies else None
+        },
+        'llm': {
+            'calls': model.calls,
+            'calls_per_request': round(model.calls / len(latencies), 2) if latencies else None,
+            'throttled': model.throttled,
+            'errors': model.errors,
+            'prompt_chars': model.prompt_chars
+        },
+        'gmail_calls': dict(gmail.calls),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def _run_thread_clients(app, request_fn, context, scenario):
+    """Send the scenario's requests from `concurrency` threads through Flask test clients.
+
+    Returns (latencies, failure messages, wall seconds).
+    """
+    latencies = []
+    failures = []
+    remaining = itertools.count()
+    latencies_lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        while next(remaining) < scenario['requests']:
+            start = time.perf_counter()
+            try:
+                request_fn(client, context)
+                elapsed = time.perf_counter() - start
+                with latencies_lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with latencies_lock:
+                    failures.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(scenario['concurrency'])]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures, time.perf_counter() - wall_start
+
+
+async def _run_async_clients(gmail, request_fn, context, scenario):
+    """Send the scenario's requests from `concurrency` coroutines to the ASGI app.
+
+    The async Gmail client talks to the fake Gmail service through an httpx
+    mock transport. Returns (latencies, failure messages, wall seconds).
+    """
+    import httpx
+    from app import routes, async_routes
+    from app.asgi import create_asgi_app
+    from app.services.async_gmail import AsyncGmailClient
+    from benchmarks.fakes import fake_gmail_transport
+
+    application = create_asgi_app()
+    async_routes.async_gmail = AsyncGmailClient(routes.gmail_client, transport=fake_gmail_transport(gmail))
+    async_routes.init_async_services()
+
+    latencies = []
+    failures = []
+    remaining = itertools.count()
+
+    async def worker(client):
+        while next(remaining) < scenario['requests']:
+            start = time.perf_counter()
+            try:
+                await request_fn(client, context)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                failures.append(str(e))
+
+    transport = httpx.ASGITransport(app=application)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=300) as client:
+            wall_start = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(scenario['concurrency'])))
+            wall = time.perf_counter() - wall_start
+    finally:
+        await async_routes.close_async_services()
+    return latencies, failures, wall
+
+
+# Request body for the /suggest-reply scenarios
+REPLY_REQUEST = {
+    'body': "Hi, could you confirm the meeting time and send the budget details before Friday?",
+    'sender_name': 'Alice',
+    'num_options': 3
+}
+
+
+def _emails_request(client, context):
+    response = client.get(context['emails_path'])
+    _check_emails_response(response.status_code, response.get_json())
+
+
+async def _emails_request_async(client, context):
+    response = await client.get(context['emails_path'])
+    _check_emails_response(response.status_code, response.json())
+
+
+def _check_emails_response(status_code, body):
+    if status_code != 200 or body.get('status') != 'success':
+        raise Exception(f"/emails returned {status_code}: {body.get('message')}")
+
+
+def _suggest_reply_request(client, context):
+    response = client.post('/suggest-reply', json=REPLY_REQUEST)
+    if response.status_code != 200:
+        raise Exception(f"/suggest-reply returned {response.status_code}")
+
+
+async def _suggest_reply_request_async(client, context):
+    response = await client.post('/suggest-reply', json=REPLY_REQUEST)
+    if response.status_code != 200:
+        raise Exception(f"/suggest-reply returned {response.status_code}")
+
+
+def _upload_request(client, context):
+    """Upload a unique file and poll its job until it finishes"""
+    n = next(context['uploads'])
+    kind = context['upload_kinds'][n % len(context['upload_kinds'])]
+    filename, _, data = context['synthetic_attachment'](kind, n)
+    if kind in ('txt', 'csv'):
+        # Make every upload unique so the content-hash store does not short-circuit it
+        data += f"\n{n},{time.time()}".encode('utf-8')
+    response = client.post('/upload-file', data={'file': (io.BytesIO(data), filename)},
+                           content_type='multipart/form-data')
+    if response.status_code != 202:
+        raise Exception(f"/upload-file returned {response.status_code}")
+    status_url = response.get_json()['status_url']
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()['job']
+        if job['status'] == 'done':
+            return
+        if job['status'] == 'failed':
+            raise Exception(f"upload job failed: {job['error']}")
+        time.sleep(0.02)
+    raise Exception("upload job timed out")
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 4)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        return None
+
+
+def _scenario_worker(args):
+    scenario, options = args
+    try:
+        return run_scenario(scenario, options)
+    except Exception as e:
+        return {'scenario': scenario, 'error': str(e)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='run a smaller scenario matrix')
+    parser.add_argument('--endpoint', choices=['emails', 'suggest_reply', 'upload_file'],
+                        help='run a single scenario for this endpoint instead of the matrix')
+    parser.add_argument('--inbox-size', type=int, default=20)
+    parser.add_argument('--attachments', choices=['none', 'light', 'mixed', 'heavy'], default='mixed')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                        help='asgi serves /emails and /suggest-reply from the asyncio routes')
+    parser.add_argument('--requests', type=int, default=4)
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='seconds per fake Gemini call')
+    parser.add_argument('--llm-jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of Gemini calls that fail')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of Gemini calls that return 429')
+    parser.add_argument('--requests-per-minute', type=int, default=6000, help='fake Gemini quota')
+    parser.add_argument('--gmail-latency', type=float, default=0.02, help='seconds per fake Gmail round trip')
+    parser.add_argument('--llm-cache', action='store_true', help='enable the in-memory LLM response cache')
+    parser.add_argument('--sync-mode', choices=['full', 'incremental'], default='full')
+    parser.add_argument('--store', choices=['cold', 'warm'], default='cold',
+                        help='cold re-analyzes every /emails request, warm serves repeats from the analysis store')
+    parser.add_argument('--reply-prefetch', action='store_true',
+                        help='pre-generate replies for top emails (background calls count as LLM calls)')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+    if args.server == 'asgi' and args.endpoint == 'upload_file':
+        parser.error('/upload-file is served by the Flask app; run it with --server wsgi')
+
+    options = {
+        'llm_latency': args.llm_latency,
+        'llm_jitter': args.llm_jitter,
+        'error_rate': args.error_rate,
+        'throttle_rate': args.throttle_rate,
+        'requests_per_minute': args.requests_per_minute,
+        'gmail_latency': args.gmail_latency,
+        'llm_cache': args.llm_cache,
+        'sync_mode': args.sync_mode,
+        'reply_prefetch': args.reply_prefetch
+    }
+    if args.endpoint:
+        scenarios = [{'endpoint': args.endpoint, 'inbox_size': args.inbox_size, 'attachments': args.attachments,
+                      'store': args.store, 'server': args.server, 'concurrency': args.concurrency,
+                      'requests': args.requests}]
+    else:
+        scenarios = default_scenarios(args.quick)
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for scenario in scenarios:
+        print(f"Running {json.dumps(scenario)}", file=sys.stderr)
+        with context.Pool(1) as pool:
+            results.append(pool.map(_scenario_worker, [(scenario, options)])[0])
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': options,
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
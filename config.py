@@ -16,6 +16,96 @@ class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     GEMINI_MODEL = 'gemini-2.0-flash'  # or 'gemini-pro' for more nuanced responses
     
+    # Gemini quota shared by all threads and workers (match these to your API tier)
+    GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+    GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '1000000'))
+    GEMINI_RATE_LIMIT_STATE_PATH = os.getenv(
+        'GEMINI_RATE_LIMIT_STATE_PATH', os.path.join('cache', 'gemini_rate_limit.json'))
+    
+    # LLM response cache (set LLM_CACHE_PATH to an empty string to keep it in memory only)
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1024'))
+    LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv('LLM_CACHE_MAX_DISK_ENTRIES', '20000'))
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))  # seconds, 0 = never expire
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('cache', 'llm_cache.sqlite3'))
+    
+    # Content-addressed attachment store shared by Gmail attachments and uploads
+    ATTACHMENT_STORE_DIR = os.getenv('ATTACHMENT_STORE_DIR', os.path.join('cache', 'attachments'))
+    ATTACHMENT_STORE_MAX_BYTES = int(os.getenv('ATTACHMENT_STORE_MAX_BYTES', str(512 * 1024 * 1024)))
+    ATTACHMENT_INLINE_MAX_BYTES = int(os.getenv('ATTACHMENT_INLINE_MAX_BYTES', str(2 * 1024 * 1024)))  # kept in memory
+    
+    # Document extraction: PDF page cap and worker processes (0 = up to 4 by CPU count)
+    PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '500'))
+    PDF_MAX_WORKERS = int(os.getenv('PDF_MAX_WORKERS', '0'))
+    
+    # Summaries: 'map_reduce' summarizes long documents chunk by chunk within the token budget,
+    # 'truncate' sends only the first SUMMARY_MAX_INPUT_CHARS characters (extraction stops once
+    # the budget is filled)
+    SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'map_reduce')
+    SUMMARY_MAX_INPUT_CHARS = int(os.getenv('SUMMARY_MAX_INPUT_CHARS', '3000'))
+    SUMMARY_CHUNK_CHARS = int(os.getenv('SUMMARY_CHUNK_CHARS', '12000'))
+    SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '60000'))
+    SUMMARY_MAX_WORKERS = int(os.getenv('SUMMARY_MAX_WORKERS', '4'))
+    
+    # Spreadsheet profiles: rows kept per sheet before statistics switch to a uniform sample,
+    # and rows per chunk when streaming CSV files
+    PROFILE_MAX_ROWS = int(os.getenv('PROFILE_MAX_ROWS', '100000'))
+    PROFILE_CSV_CHUNK_ROWS = int(os.getenv('PROFILE_CSV_CHUNK_ROWS', '50000'))
+    
+    # Background jobs for file uploads
+    JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', os.path.join('cache', 'jobs.sqlite3'))
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '2'))
+    
+    # Threads downloading Gmail attachments; each keeps its own service and keep-alive connection across requests
+    GMAIL_MAX_WORKERS = int(os.getenv('GMAIL_MAX_WORKERS', '4'))
+    
+    # ASGI mode (asgi.py): Gemini calls in flight per process, and pooled connections and
+    # concurrent calls to the Gmail REST API
+    ASYNC_LLM_MAX_CONCURRENCY = int(os.getenv('ASYNC_LLM_MAX_CONCURRENCY', '64'))
+    ASYNC_GMAIL_MAX_CONNECTIONS = int(os.getenv('ASYNC_GMAIL_MAX_CONNECTIONS', '20'))
+    ASYNC_GMAIL_MAX_CONCURRENCY = int(os.getenv('ASYNC_GMAIL_MAX_CONCURRENCY', '10'))
+    
+    # Email analysis settings
+    ANALYSIS_MAX_WORKERS = int(os.getenv('ANALYSIS_MAX_WORKERS', '8'))  # 1 = serial analysis
+    
+    # Local pre-scoring: emails at or above the low-signal confidence threshold skip the LLM
+    PRESCORE_ENABLED = os.getenv('PRESCORE_ENABLED', 'true').lower() == 'true'
+    PRESCORE_SKIP_THRESHOLD = float(os.getenv('PRESCORE_SKIP_THRESHOLD', '0.7'))
+    LOW_SIGNAL_SENDER_DOMAINS = [d.strip() for d in os.getenv('LOW_SIGNAL_SENDER_DOMAINS', '').split(',') if d.strip()]
+    IMPORTANT_SENDER_DOMAINS = [d.strip() for d in os.getenv('IMPORTANT_SENDER_DOMAINS', '').split(',') if d.strip()]
+    
+    # Ranking: 'local' scores emails from their analyses, 'llm' asks Gemini to rank them (one extra call).
+    # SENDER_WEIGHTS is a comma-separated list of address-or-domain:weight pairs added to the local score
+    RANKING_MODE = os.getenv('RANKING_MODE', 'local')
+    SENDER_WEIGHTS = {
+        pair.split(':', 1)[0].strip().lower(): float(pair.split(':', 1)[1])
+        for pair in os.getenv('SENDER_WEIGHTS', '').split(',') if ':' in pair
+    }
+    
+    # Reply prefetching: reply options generated in the background for the top emails of each
+    # ranked page (0 = off), at most REPLY_PREFETCH_HOURLY_BUDGET speculative generations per hour
+    REPLY_PREFETCH_TOP_K = int(os.getenv('REPLY_PREFETCH_TOP_K', '3'))
+    REPLY_PREFETCH_NUM_OPTIONS = int(os.getenv('REPLY_PREFETCH_NUM_OPTIONS', '3'))  # match what the UI requests
+    REPLY_PREFETCH_HOURLY_BUDGET = int(os.getenv('REPLY_PREFETCH_HOURLY_BUDGET', '60'))
+    REPLY_PREFETCH_MAX_ENTRIES = int(os.getenv('REPLY_PREFETCH_MAX_ENTRIES', '256'))
+    REPLY_PREFETCH_TTL = int(os.getenv('REPLY_PREFETCH_TTL', '3600'))  # seconds, 0 = never expire
+    REPLY_PREFETCH_MAX_WORKERS = int(os.getenv('REPLY_PREFETCH_MAX_WORKERS', '2'))
+    
+    # Inbox pages: emails listed and analyzed per /emails request, and the largest page a client may ask for
+    INBOX_PAGE_SIZE = int(os.getenv('INBOX_PAGE_SIZE', '10'))
+    INBOX_MAX_PAGE_SIZE = int(os.getenv('INBOX_MAX_PAGE_SIZE', '50'))
+    
+    # Inbox sync: 'incremental' checks Gmail history and keeps the first page in a local store,
+    # 'full' relists every time
+    INBOX_SYNC_MODE = os.getenv('INBOX_SYNC_MODE', 'incremental')
+    MESSAGE_STORE_PATH = os.getenv('MESSAGE_STORE_PATH', os.path.join('cache', 'messages.sqlite3'))
+    
+    # Indexed store of email analyses served by /analyses; analyses not read or saved for
+    # ANALYSIS_STORE_MAX_AGE_DAYS are pruned at startup (0 = keep forever), and ones saved more
+    # than ANALYSIS_REFRESH_DAYS ago are recomputed the next time their email is listed (0 = never)
+    ANALYSIS_STORE_PATH = os.getenv('ANALYSIS_STORE_PATH', os.path.join('cache', 'analyses.sqlite3'))
+    ANALYSIS_STORE_MAX_AGE_DAYS = int(os.getenv('ANALYSIS_STORE_MAX_AGE_DAYS', '90'))
+    ANALYSIS_REFRESH_DAYS = int(os.getenv('ANALYSIS_REFRESH_DAYS', '7'))
+    
     # File upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join('app', 'static', 'uploads')
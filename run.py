@@ -1,6 +1,9 @@
+import os
 from app import create_app
 
-app = create_app()
+# The debug reloader runs this script twice; only the child it marks with
+# WERKZEUG_RUN_MAIN serves requests, so the watching parent starts no job worker
+app = create_app(start_services=__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file